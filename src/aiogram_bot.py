@@ -4,7 +4,13 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 import asyncio
+import atexit
 import os
+import threading
+
+from notify_dispatcher import PRIORITY_CLOSE, PRIORITY_OPEN, PRIORITY_INFO
+from subscribers import SubscriberRegistry, FanOut
+from event_log import events
 
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
@@ -14,6 +20,16 @@ bot = Bot(token=BOT_TOKEN)
 
 MY_CHAT_ID = 597695657
 
+_registry = None
+
+def get_registry():
+    """Subscriber registry, opened on first use so importing the module touches no files"""
+    global _registry
+    if _registry is None:
+        _registry = SubscriberRegistry()
+        _registry.ensure(MY_CHAT_ID)
+    return _registry
+
 class PositionSizeState(StatesGroup):
     waiting_for_size = State()
     
@@ -37,40 +53,71 @@ START_MESSAGE = """FireflyX — ваш личный помощник в крип
 async def send_welcome(message: types.Message):
     """This handler will be called when user sends `/start` command"""
     print(f"Chat ID: {message.chat.id}")
+    get_registry().subscribe(message.chat.id)
     await message.reply(START_MESSAGE, reply_markup=main_keyboard)
 
-_notification_loop = None
-_notification_queue = asyncio.Queue()
-_notification_task = None
-
-def _get_notification_loop():
-    global _notification_loop, _notification_task
-    if _notification_loop is None:
-        _notification_loop = asyncio.new_event_loop()
-        _notification_task = _notification_loop.create_task(_process_notifications())
-        
-        import threading
-        def run_loop():
-            asyncio.set_event_loop(_notification_loop)
-            _notification_loop.run_forever()
-        
-        threading.Thread(target=run_loop, daemon=True).start()
-    
-    return _notification_loop
-
-async def _process_notifications():
-    while True:
-        text = await _notification_queue.get()
-        try:
-            await bot.send_message(MY_CHAT_ID, text)
-        except Exception as e:
-            print(f"Error sending notification: {e}")
-        finally:
-            _notification_queue.task_done()
-
-def send_notification(text):
-    loop = _get_notification_loop()
-    loop.call_soon_threadsafe(lambda: _notification_queue.put_nowait(text))
+async def stop_notifications(message: types.Message):
+    """This handler will be called when user sends `/stop` command"""
+    get_registry().unsubscribe(message.chat.id)
+    await message.reply("🔕 Уведомления отключены. /start - включить снова")
+
+_fanout = None
+_loop = None
+_worker_lock = threading.Lock()
+
+async def start_notifications():
+    """Runs the notification fan-out as a component of the calling (engine) loop"""
+    global _fanout, _loop
+    _loop = asyncio.get_running_loop()
+    _fanout = FanOut(bot, get_registry())
+    _fanout.start()
+    return _fanout
+
+async def stop_notification_fanout(timeout=30.0):
+    """Sends everything still queued, then stops the fan-out"""
+    global _fanout, _loop
+    if _fanout is None:
+        return
+    await _fanout.close(drain=True, timeout=timeout)
+    events.info("notify.stopped", **_fanout.stats())
+    _fanout = _loop = None
+
+def _start_worker():
+    """Own loop on a worker thread for callers without an event loop (main_simulation)"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start_notifications())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="notifications", daemon=True).start()
+    ready.wait()
+    atexit.register(_stop_worker, loop)
+
+def _stop_worker(loop, timeout=30.0):
+    asyncio.run_coroutine_threadsafe(stop_notification_fanout(timeout), loop).result(timeout + 5)
+    loop.call_soon_threadsafe(loop.stop)
+
+def send_notification(text, priority=PRIORITY_INFO):
+    """
+    Queues a message for all subscribers (closes go before opens).
+    On the engine loop this is a plain enqueue; other threads hand it over once.
+    """
+    if _fanout is None:
+        with _worker_lock:
+            if _fanout is None:
+                _start_worker()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _loop:
+        _fanout.publish(text, priority)
+    else:
+        _loop.call_soon_threadsafe(_fanout.publish, text, priority)
 
 def format_position_close_notification(symbol, position_details):
     """Format notification for position closure with P&L information"""
@@ -133,6 +180,7 @@ async def change_position_size(message: types.Message, state: FSMContext):
 async def process_position_size(message: types.Message, state: FSMContext):
     try:
         size_value = float(message.text)
+        get_registry().update_settings(message.chat.id, position_size=size_value)
         await state.clear()
         await message.reply(f"✅ Размер позиции установлен: ${size_value:.2f}", reply_markup=main_keyboard)
     except ValueError:
@@ -149,18 +197,21 @@ async def process_max_positions(message: types.Message, state: FSMContext):
             await message.reply("❌ Значение должно быть положительным числом.")
             return
             
+        get_registry().update_settings(message.chat.id, max_positions=max_value)
         await state.clear() 
         await message.reply(f"✅ Максимальное количество позиций установлено: {max_value}", reply_markup=main_keyboard)
     except ValueError:
         await message.reply("❌ Пожалуйста, введите корректное целое число.")
 
 dp.message.register(send_welcome, Command(commands=['start']))
+dp.message.register(stop_notifications, Command(commands=['stop']))
 dp.message.register(change_position_size, lambda message: message.text == "💰 Размер позиции")
 dp.message.register(process_position_size, PositionSizeState.waiting_for_size)
 dp.message.register(change_max_positions, lambda message: message.text == "🔢 Макс. позиций")
 dp.message.register(process_max_positions, MaxPositionsState.waiting_for_max)
 
 async def main():
+    get_registry()
     await dp.start_polling(bot)
 
 if __name__ == '__main__':
@@ -0,0 +1,75 @@
+"""
+Microbenchmark of kline frame decoding: frames/sec of the old
+`json.loads` + copy path against kline_decode with each installed backend,
+on a synthetic 1m combined stream (59 non-final frames per closed candle).
+
+    python bench_decode.py [n_frames]
+"""
+import json
+import sys
+import time
+
+from kline_decode import available_backends, make_decoder
+
+
+def synthetic_frames(n, symbols=("BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"), updates_per_candle=60):
+    """Binance-shaped kline frames, the last update of every candle is final"""
+    frames = []
+    t = 1_700_000_000_000
+    price = 100.0
+    for i in range(n):
+        symbol = symbols[i % len(symbols)]
+        update = (i // len(symbols)) % updates_per_candle
+        open_time = t + 60_000 * ((i // len(symbols)) // updates_per_candle)
+        price *= 1.0001 if i % 3 else 0.9999
+        frames.append(json.dumps({
+            "stream": f"{symbol.lower()}@kline_1m",
+            "data": {
+                "e": "kline", "E": open_time + update * 1000, "s": symbol,
+                "k": {
+                    "t": open_time, "T": open_time + 59_999, "s": symbol, "i": "1m",
+                    "f": 100 * i, "L": 100 * i + 99,
+                    "o": f"{price:.4f}", "c": f"{price * 1.001:.4f}",
+                    "h": f"{price * 1.002:.4f}", "l": f"{price * 0.999:.4f}",
+                    "v": "1000.5", "n": 100, "x": update == updates_per_candle - 1,
+                    "q": "100050.0", "V": "500.2", "Q": "50020.0", "B": "0",
+                },
+            },
+        }, separators=(",", ":")))
+    return frames
+
+
+def baseline(msg):
+    """The previous listen() path: full json.loads of every frame and a string copy"""
+    data = json.loads(msg)["data"]["k"]
+    if not data["x"]:
+        return None
+    return {"s": data["s"].lower(), "o": data["o"], "c": data["c"], "t": data["t"], "T": data["T"], "v": data["v"]}
+
+
+def measure(decode, frames, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        closed = sum(1 for msg in frames if decode(msg) is not None)
+        best = min(best, time.perf_counter() - started)
+    return len(frames) / best, closed
+
+
+def main(n=240_000):
+    frames = synthetic_frames(n)
+    rows = [("json.loads (before)", baseline)]
+    for backend in available_backends():
+        rows.append((f"{backend}", make_decoder(backend, skip_not_final=False)))
+        rows.append((f"{backend} + x skip", make_decoder(backend)))
+
+    base_rate = None
+    print(f"{n} frames")
+    for name, decode in rows:
+        rate, closed = measure(decode, frames)
+        base_rate = base_rate or rate
+        print(f"{name:<24} {rate:>12,.0f} frames/s  x{rate / base_rate:5.1f}  ({closed} closed)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 240_000)
@@ -0,0 +1,122 @@
+import pandas as pd
+
+TIMEFRAME_MS = {
+    "1m": 60_000,
+    "3m": 180_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "30m": 1_800_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+TIMEFRAMES = ("5m", "15m", "1h")
+BASE_MS = TIMEFRAME_MS["1m"]
+
+
+class CandleAggregator:
+    """
+    Rolls closed 1m klines up into higher timeframe bars per symbol.
+
+    Every 1m candle updates one running bar per timeframe (O(1) per candle
+    and timeframe); a bar is emitted with the 1m candle that closes it, in
+    the same kline dict format (s, o, h, l, c, v, t, T). When that candle
+    is missed, the open bar is emitted with the first candle of a later bar
+    instead. Bars whose first minutes were not seen (engine started
+    mid-bar) are not emitted.
+    Monitors (PumpTable or PumpMonitor) attached to a timeframe get every
+    emitted bar of their symbols through `process_kline`.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES):
+        self.timeframes = {tf: TIMEFRAME_MS[tf] for tf in timeframes}
+        # {(symbol, timeframe): [open_time, o, h, l, c, v, complete]}
+        self.bars = {}
+        self.monitors = {tf: [] for tf in self.timeframes}
+
+    def attach(self, timeframe, monitor):
+        """Runs `monitor.process_kline` on every closed bar of `timeframe`"""
+        if timeframe not in self.timeframes:
+            raise ValueError(f"timeframe {timeframe} is not aggregated, use one of {list(self.timeframes)}")
+        self.monitors[timeframe].append(monitor)
+        return monitor
+
+    def add(self, kline):
+        """
+        Closed 1m kline -> list of (timeframe, bar) closed by it.
+        h/l default to the candle body when the kline has none (old replays).
+        """
+        symbol = kline["s"]
+        o = float(kline["o"])
+        c = float(kline["c"])
+        h = float(kline["h"]) if "h" in kline else max(o, c)
+        l = float(kline["l"]) if "l" in kline else min(o, c)
+        v = float(kline.get("v") or 0.0)
+        close_time = int(kline["T"])
+        # minute of the candle; replays may carry close times that are not minute aligned
+        open_time = int(kline["t"]) if "t" in kline else close_time - close_time % BASE_MS
+
+        closed = []
+        for tf, ms in self.timeframes.items():
+            start = open_time - open_time % ms
+            key = (symbol, tf)
+            bar = self.bars.get(key)
+            if bar is not None and bar[0] < start:
+                # the candle closing this bar never came
+                if bar[6]:
+                    closed.append((tf, _bar_kline(symbol, bar, ms)))
+                bar = None
+            if bar is None or bar[0] != start:
+                bar = self.bars[key] = [start, o, h, l, c, v, open_time == start]
+            else:
+                if h > bar[2]:
+                    bar[2] = h
+                if l < bar[3]:
+                    bar[3] = l
+                bar[4] = c
+                bar[5] += v
+            if open_time + BASE_MS >= start + ms:
+                del self.bars[key]
+                if bar[6]:
+                    closed.append((tf, _bar_kline(symbol, bar, ms)))
+        return closed
+
+    def process(self, kline):
+        """
+        `add` plus the attached monitors: list of (timeframe, bar, monitor, state)
+        for every closed bar and monitor watching its symbol
+        """
+        results = []
+        for tf, bar in self.add(kline):
+            for monitor in self.monitors[tf]:
+                if not _watches(monitor, bar["s"]):
+                    continue
+                state = monitor.process_kline(bar)
+                results.append((tf, bar, monitor, state if state is not None else monitor.state))
+        return results
+
+
+def _bar_kline(symbol, bar, ms):
+    start = bar[0]
+    return {
+        "s": symbol, "o": bar[1], "h": bar[2], "l": bar[3], "c": bar[4], "v": bar[5],
+        "t": start, "T": start + ms - 1,
+    }
+
+
+def _watches(monitor, symbol):
+    index = getattr(monitor, "index", None)
+    return symbol in index if index is not None else monitor.symbol == symbol
+
+
+def resample(klines, timeframe):
+    """
+    Bars of `timeframe` from 1m klines (dicts or a DataFrame with the same
+    columns, ordered by close time) through the live aggregation path,
+    as a DataFrame for research
+    """
+    if isinstance(klines, pd.DataFrame):
+        klines = klines.to_dict("records")
+    aggregator = CandleAggregator((timeframe,))
+    bars = [bar for kline in klines for _, bar in aggregator.add(kline)]
+    return pd.DataFrame(bars, columns=["s", "t", "T", "o", "h", "l", "c", "v"])
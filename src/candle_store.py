@@ -0,0 +1,158 @@
+import numbers
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ohlcv_download import partition_symbol
+
+# <root>/<SYMBOL>/<column>.bin, one raw little-endian array per column
+CANDLE_STORE_DIR = os.getenv('CANDLE_STORE_DIR', 'candle_store')
+STORE_COLUMNS = (
+    ("time", np.dtype("<i8")),
+    ("open", np.dtype("<f8")),
+    ("high", np.dtype("<f8")),
+    ("low", np.dtype("<f8")),
+    ("close", np.dtype("<f8")),
+    ("volume", np.dtype("<f8")),
+)
+MINUTE_MS = 60_000
+
+Candles = namedtuple("Candles", [name for name, _ in STORE_COLUMNS])
+
+
+def to_ms(value):
+    """ms timestamp from a number (ms, int or float), a datetime string or a Timestamp (None stays None)"""
+    if value is None:
+        return None
+    if isinstance(value, numbers.Real) and not isinstance(value, (bool, np.bool_)):
+        return int(value)
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+class CandleStore:
+    """
+    1m candles per ticker as memory-mapped columnar arrays.
+
+    Every ticker is a directory of raw arrays, one per column, ordered by
+    `time` (candle open time, ms). `query(ticker, start, end)` finds the
+    range by binary search on `time` and returns views into the mapped
+    files: nothing is read or copied until the values are used, so slicing
+    a few hours out of years of history costs the same as slicing a file
+    of one day. New candles are appended to the end of the files, stored
+    ones are never rewritten.
+    """
+
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._series = {}
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isfile(self._path(name, "time")))
+
+    def series(self, ticker):
+        """All candles of `ticker` as memory-mapped arrays"""
+        name = partition_symbol(ticker).upper()
+        candles = self._series.get(name)
+        if candles is None:
+            if not os.path.isfile(self._path(name, "time")):
+                raise KeyError(f"{ticker} is not in the candle store {self.root}")
+            # columns are appended before `time`, so rows beyond it may be incomplete
+            length = os.path.getsize(self._path(name, "time")) // 8
+            candles = self._series[name] = Candles(*(
+                np.memmap(self._path(name, column), dtype=dtype, mode="r", shape=(length,))
+                if length else np.empty(0, dtype)
+                for column, dtype in STORE_COLUMNS
+            ))
+        return candles
+
+    def query(self, ticker, start=None, end=None):
+        """
+        Candles of `ticker` opened in [start, end] (ms, datetime strings or
+        Timestamps; None is open-ended) as zero-copy views
+        """
+        candles = self.series(ticker)
+        lo = 0 if start is None else int(np.searchsorted(candles.time, to_ms(start), "left"))
+        hi = len(candles.time) if end is None else int(np.searchsorted(candles.time, to_ms(end), "right"))
+        return Candles(*(column[lo:hi] for column in candles))
+
+    def frame(self, ticker, start=None, end=None):
+        """`query` as a DataFrame in the parquet layout (ticker, datetime, open, ...) for notebooks"""
+        candles = self.query(ticker, start, end)
+        df = pd.DataFrame({name: getattr(candles, name) for name, _ in STORE_COLUMNS[1:]})
+        df.insert(0, "ticker", ticker)
+        df.insert(1, "datetime", pd.to_datetime(np.asarray(candles.time), unit="ms"))
+        return df
+
+    def klines(self, ticker, start=None, end=None):
+        """`query` as kline dicts (s, t, T, o, h, l, c, v) in replay order, for the simulator"""
+        candles = self.query(ticker, start, end)
+        symbol = partition_symbol(ticker).lower()
+        for t, o, h, l, c, v in zip(*(column.tolist() for column in candles)):
+            yield {"s": symbol, "t": t, "T": t + MINUTE_MS - 1, "o": o, "h": h, "l": l, "c": c, "v": v}
+
+    def last_time(self, ticker):
+        try:
+            candles = self.series(ticker)
+        except KeyError:
+            return None
+        return int(candles.time[-1]) if len(candles.time) else None
+
+    def append(self, ticker, time, open, high, low, close, volume):
+        """
+        Appends candles newer than the last stored one (older and duplicate
+        times are skipped); returns the number of candles written
+        """
+        name = partition_symbol(ticker).upper()
+        time = np.asarray(time, dtype=np.int64)
+        columns = [np.asarray(values, dtype=np.float64) for values in (open, high, low, close, volume)]
+        order = np.argsort(time, kind="stable")
+        time = time[order]
+        keep = np.ones(len(time), dtype=bool)
+        keep[1:] = time[1:] != time[:-1]
+        last = self.last_time(ticker)
+        if last is not None:
+            keep &= time > last
+        if not keep.any():
+            return 0
+
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        for (column, dtype), values in zip(STORE_COLUMNS[1:], columns):
+            self._write(name, column, values[order][keep].astype(dtype))
+        # `time` last: its length is what readers trust
+        self._write(name, "time", time[keep].astype(STORE_COLUMNS[0][1]))
+        self._series.pop(name, None)
+        return int(keep.sum())
+
+    def add_frame(self, df):
+        """Appends a DataFrame in the parquet layout (ticker, datetime, open, high, low, close, volume)"""
+        written = {}
+        for ticker, g in df.groupby("ticker", sort=False, observed=True):
+            written[ticker] = self.append(
+                ticker, g["datetime"].to_numpy("datetime64[ms]").astype(np.int64),
+                g["open"], g["high"], g["low"], g["close"], g["volume"],
+            )
+        return written
+
+    def _write(self, name, column, values):
+        path = self._path(name, column)
+        length = os.path.getsize(self._path(name, "time")) // 8 if os.path.isfile(self._path(name, "time")) else 0
+        with open(path, "ab") as f:
+            # drop the tail of a column written by an append that did not reach `time`
+            f.truncate(length * values.dtype.itemsize)
+            f.write(values.tobytes())
+
+    def _path(self, name, column):
+        return os.path.join(self.root, name, f"{column}.bin")
+
+
+if __name__ == "__main__":
+    # python candle_store.py 03_05_1m.parquet [store dir]   (a file or the ohlcv_download dataset)
+    store = CandleStore(sys.argv[2] if len(sys.argv) > 2 else CANDLE_STORE_DIR)
+    source = pd.read_parquet(sys.argv[1], columns=["ticker", "datetime", "open", "high", "low", "close", "volume"])
+    for ticker, n in store.add_frame(source).items():
+        print(f"{ticker}: {n} new candles")
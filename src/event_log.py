@@ -0,0 +1,143 @@
+import atexit
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+def _env_level(name, default):
+    """Level from the environment; unknown names fall back to `default` with a warning"""
+    value = os.getenv(name, default).upper()
+    if value not in LEVELS:
+        sys.stderr.write(f"Unknown {name}={value!r}, using {default} (one of {', '.join(LEVELS)})\n")
+        value = default
+    return LEVELS[value]
+
+
+EVENT_LOG_PATH = os.getenv('EVENT_LOG_PATH', 'events.jsonl')
+EVENT_LOG_LEVEL = _env_level('EVENT_LOG_LEVEL', 'INFO')
+# events from this level up are also echoed to stderr
+EVENT_LOG_ECHO_LEVEL = _env_level('EVENT_LOG_ECHO_LEVEL', 'WARNING')
+
+
+def _default(value):
+    # numpy scalars and anything else json does not know
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class EventLog:
+    """
+    Structured event log for the engine, order manager and monitors.
+
+    `event` appends a (time, level, name, fields) tuple to an in-memory
+    buffer; a background thread writes the buffer as compact JSON lines to
+    `path`. Disabled levels return before any formatting. Hot paths check
+    the precomputed `debug_enabled`/`info_enabled` flags before building
+    the fields at all. The writer thread starts with the first event, so
+    importing the module neither starts a thread nor creates the file.
+    """
+
+    def __init__(self, path=EVENT_LOG_PATH, level=EVENT_LOG_LEVEL, echo_level=EVENT_LOG_ECHO_LEVEL,
+                 flush_interval=1.0, max_buffer=100_000):
+        self.path = path
+        self.echo_level = echo_level
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self.set_level(level)
+
+        self._buffer = collections.deque()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def set_level(self, level):
+        self.level = level
+        self.debug_enabled = level <= DEBUG
+        self.info_enabled = level <= INFO
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def event(self, level, name, **fields):
+        if level < self.level:
+            return
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append((time.time(), level, name, fields))
+        if self._thread is None:
+            self._start()
+
+    def debug(self, name, **fields):
+        if self.debug_enabled:
+            self.event(DEBUG, name, **fields)
+
+    def info(self, name, **fields):
+        if self.info_enabled:
+            self.event(INFO, name, **fields)
+
+    def warning(self, name, **fields):
+        self.event(WARNING, name, **fields)
+
+    def error(self, name, **fields):
+        self.event(ERROR, name, **fields)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        lines = []
+        echo = []
+        while self._buffer:
+            ts, level, name, fields = self._buffer.popleft()
+            line = json.dumps(
+                {"ts": round(ts, 6), "level": LEVEL_NAMES[level], "event": name, **fields},
+                separators=(",", ":"), ensure_ascii=False, default=_default,
+            )
+            lines.append(line)
+            if level >= self.echo_level:
+                echo.append(line)
+        if self.dropped:
+            lines.append(json.dumps({"ts": time.time(), "level": "WARNING", "event": "log.dropped", "count": self.dropped}))
+            self.dropped = 0
+
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+        if echo:
+            sys.stderr.write("\n".join(echo) + "\n")
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                sys.stderr.write(f"Error writing event log: {e}\n")
+
+
+events = EventLog()
+atexit.register(events.close)
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+
+class FakeRetryAfter(TelegramRetryAfter):
+    """aiogram's TelegramRetryAfter (HTTP 429 flood control) of a fake send"""
+
+    def __init__(self, chat_id, text, retry_after):
+        super().__init__(SendMessage(chat_id=chat_id, text=text), "Flood control exceeded", retry_after)
+
+
+class FakeForbidden(TelegramForbiddenError):
+    """aiogram's TelegramForbiddenError (bot blocked by the user) of a fake send"""
+
+    def __init__(self, chat_id, text):
+        super().__init__(SendMessage(chat_id=chat_id, text=text), f"Forbidden: bot was blocked by the user {chat_id}")
+
+
+class FakeBot:
+    """
+    Local stand-in for aiogram's Bot to check notification throughput
+    and ordering without Telegram.
+
+    `send_message` takes `latency` seconds and records (time, chat_id, text)
+    in `sent`. More than `chat_rate` messages per second to one chat, or
+    `global_rate` overall, raise FakeRetryAfter like Telegram's flood control.
+    Chats in `blocked` raise a non-retryable error.
+    """
+
+    def __init__(self, latency=0.0, chat_rate=1.0, chat_burst=3, global_rate=30.0, retry_after=1.0, blocked=()):
+        self.latency = latency
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_rate = global_rate
+        self.retry_after = retry_after
+        self.blocked = set(blocked)
+        self.sent = []
+        self.rejected = 0
+        self._chat_tokens = {}
+        self._global = [global_rate, time.monotonic()]
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if chat_id in self.blocked:
+            raise FakeForbidden(chat_id, text)
+        now = time.monotonic()
+        tokens, updated = self._chat_tokens.get(chat_id, (self.chat_burst, now))
+        tokens = min(self.chat_burst, tokens + (now - updated) * self.chat_rate)
+        g_tokens = min(self.global_rate, self._global[0] + (now - self._global[1]) * self.global_rate)
+        self._global[1] = now
+        if tokens < 1 or g_tokens < 1:
+            self._chat_tokens[chat_id] = (tokens, now)
+            self._global[0] = g_tokens
+            self.rejected += 1
+            raise FakeRetryAfter(chat_id, text, self.retry_after)
+        self._chat_tokens[chat_id] = (tokens - 1, now)
+        self._global[0] = g_tokens - 1
+        self.sent.append((time.time(), chat_id, text))
+        return dict(chat_id=chat_id, text=text)
+
+    def messages(self, chat_id=None):
+        return [text for _, c, text in self.sent if chat_id is None or c == chat_id]
@@ -0,0 +1,93 @@
+import asyncio
+import zlib
+
+import numpy as np
+
+MINUTE_MS = 60_000
+
+try:
+    from ccxt import NetworkError, RateLimitExceeded
+except ImportError:
+    # same names and hierarchy as ccxt's errors, so the downloader handles both alike
+    class BaseError(Exception):
+        pass
+
+    class NetworkError(BaseError):
+        pass
+
+    class DDoSProtection(NetworkError):
+        pass
+
+    class RateLimitExceeded(DDoSProtection):
+        """HTTP 429"""
+
+
+class FakeExchange:
+    """
+    Local stand-in for a ccxt async exchange to check the OHLCV downloader
+    without network access.
+
+    `fetch_ohlcv` serves deterministic 1m candles (a random walk per symbol,
+    seeded by its name) from `start` up to the current minute of `now`,
+    as ccxt does: [[timestamp_ms, o, h, l, c, v], ...], at most `limit`
+    rows, the last candle still open. Calls faster than `rateLimit`
+    milliseconds apart raise ccxt's RateLimitExceeded; `fail_every` raises
+    its NetworkError on every n-th call. Symbols in `gaps` miss the candles
+    of the given (start_ms, end_ms) ranges, like delisted or halted markets.
+    """
+
+    id = "fake"
+
+    def __init__(self, symbols, start, now, rateLimit=50, latency=0.0, fail_every=0, gaps=None):
+        self.symbols = list(symbols)
+        self.start = start - start % MINUTE_MS
+        self.now = now
+        self.rateLimit = rateLimit
+        self.latency = latency
+        self.fail_every = fail_every
+        self.gaps = dict(gaps or {})
+        self.calls = 0
+        self.rejected = 0
+        self._last_call = None
+        self.closed = False
+
+    def milliseconds(self):
+        return self.now
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=1000):
+        if timeframe != "1m":
+            raise ValueError(f"fake exchange serves 1m candles only, not {timeframe}")
+        if symbol not in self.symbols:
+            raise ValueError(f"unknown symbol {symbol}")
+        loop_time = asyncio.get_running_loop().time()
+        # a little slack for the timer resolution of the caller's limiter
+        if self._last_call is not None and (loop_time - self._last_call) * 1000 < self.rateLimit * 0.9:
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.id} 429 Too Many Requests")
+        self._last_call = loop_time
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail_every and self.calls % self.fail_every == 0:
+            raise NetworkError(f"{self.id} connection reset")
+
+        since = self.start if since is None else max(since, self.start)
+        first = since + (-since) % MINUTE_MS
+        last = self.now - self.now % MINUTE_MS
+        times = np.arange(first, last + 1, MINUTE_MS, dtype=np.int64)
+        for gap_start, gap_end in self.gaps.get(symbol, ()):
+            times = times[(times < gap_start) | (times > gap_end)]
+        times = times[:limit]
+        return [[int(t), *self._candle(symbol, int(t))] for t in times]
+
+    def _candle(self, symbol, timestamp):
+        n = (timestamp - self.start) // MINUTE_MS
+        rng = np.random.default_rng([zlib.crc32(symbol.encode()), n])
+        o = 1.0 + 0.001 * (n % 997)
+        c = o * (1 + rng.normal(0, 0.002))
+        h = max(o, c) * (1 + abs(rng.normal(0, 0.001)))
+        l = min(o, c) * (1 - abs(rng.normal(0, 0.001)))
+        return [o, h, l, c, float(rng.integers(1, 10_000))]
+
+    async def close(self):
+        self.closed = True
@@ -0,0 +1,84 @@
+import decimal
+import json
+import os
+import time
+from event_log import events
+
+FILTERS_CACHE_PATH = os.getenv('FILTERS_CACHE_PATH', 'instrument_filters.json')
+FILTERS_CACHE_TTL = 24 * 60 * 60
+
+
+def parse_filters(info):
+    """
+    Фильтры инструмента из строки get_instruments_info
+    -> (price_decimals, qty_decimals, min_qty)
+    """
+    min_qty = info.get('lotSizeFilter', {}).get('minOrderQty', '0.0')
+    qty_decimals = abs(decimal.Decimal(min_qty).as_tuple().exponent)
+    price_decimals = int(info.get('priceScale', '4'))
+    return price_decimals, qty_decimals, float(min_qty)
+
+
+def fetch_filters(cl, category="linear"):
+    """
+    Фильтры всех инструментов категории, постранично (1000 на запрос)
+    -> {symbol: (price_decimals, qty_decimals, min_qty)}
+    """
+    filters = {}
+    cursor = None
+    while True:
+        args = dict(category=category, limit=1000)
+        if cursor:
+            args['cursor'] = cursor
+        r = cl.get_instruments_info(**args).get('result', {})
+        for info in r.get('list', []):
+            filters[info['symbol']] = parse_filters(info)
+        cursor = r.get('nextPageCursor')
+        if not cursor:
+            return filters
+
+
+def load_filters(cl, category="linear", cache_path=FILTERS_CACHE_PATH, ttl=FILTERS_CACHE_TTL):
+    """
+    Таблица фильтров для FuturesOrders: из локального кеша, пока он моложе ttl,
+    иначе одним пакетным запросом к бирже с обновлением кеша.
+    Если биржа недоступна, используется устаревший кеш.
+    cache_path=None - без кеша
+    """
+    cached = _read_cache(cache_path, category)
+    if cached and time.time() - cached['saved_at'] < ttl:
+        return cached['filters']
+
+    try:
+        filters = fetch_filters(cl, category)
+    except Exception as e:
+        if cached:
+            events.warning("filters.stale_cache", saved_at=cached['saved_at'], error=repr(e))
+            return cached['filters']
+        raise
+
+    if cache_path:
+        _write_cache(cache_path, category, filters)
+    return filters
+
+
+def _read_cache(cache_path, category):
+    if not cache_path or not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        events.warning("filters.bad_cache", path=cache_path, error=repr(e))
+        return None
+    if cache.get('category') != category:
+        return None
+    cache['filters'] = {s: tuple(f) for s, f in cache['filters'].items()}
+    return cache
+
+
+def _write_cache(cache_path, category, filters):
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'saved_at': time.time(), 'category': category, 'filters': filters}, f)
+    os.replace(tmp_path, cache_path)
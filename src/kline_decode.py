@@ -0,0 +1,129 @@
+import json
+
+try:
+    import msgspec
+except ImportError:  # optional, falls back to orjson / json
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Binance sends compact JSON; 59 of 60 kline frames of a 1m stream are not final
+NOT_FINAL = '"x":false'
+NOT_FINAL_BYTES = NOT_FINAL.encode()
+
+
+if msgspec is not None:
+    class KlinePayload(msgspec.Struct):
+        """Fields of the Binance kline payload we use; the rest are skipped by the decoder"""
+        s: str
+        t: int
+        T: int
+        o: float
+        c: float
+        h: float
+        l: float
+        v: float
+        x: bool
+
+    class KlineData(msgspec.Struct):
+        k: KlinePayload
+
+    class KlineFrame(msgspec.Struct):
+        data: KlineData
+
+    class AggTrade(msgspec.Struct):
+        s: str
+        p: float
+        T: int
+
+    class AggTradeFrame(msgspec.Struct):
+        data: AggTrade
+
+
+def _kline(s, o, h, l, c, t, T, v):
+    return {"s": s.lower(), "o": o, "h": h, "l": l, "c": c, "t": t, "T": T, "v": v}
+
+
+def _msgspec_decoder():
+    # strict=False converts Binance's quoted numbers straight into the typed float fields
+    decoder = msgspec.json.Decoder(KlineFrame, strict=False)
+
+    def decode(msg):
+        k = decoder.decode(msg).data.k
+        if not k.x:
+            return None
+        return _kline(k.s, k.o, k.h, k.l, k.c, k.t, k.T, k.v)
+    return decode
+
+
+def _loads_decoder(loads):
+    def decode(msg):
+        k = loads(msg)["data"]["k"]
+        if not k["x"]:
+            return None
+        return _kline(
+            k["s"], float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), k["t"], k["T"], float(k["v"]),
+        )
+    return decode
+
+
+def available_backends():
+    backends = ["json"]
+    if orjson is not None:
+        backends.insert(0, "orjson")
+    if msgspec is not None:
+        backends.insert(0, "msgspec")
+    return backends
+
+
+def make_decoder(backend=None, skip_not_final=True):
+    """
+    Combined-stream kline frame (str or bytes) -> kline dict with float prices
+    for closed candles, None for the rest.
+    backend: "msgspec", "orjson" or "json", by default the fastest installed one.
+    skip_not_final drops frames containing `"x":false` before any parsing.
+    """
+    backend = backend or available_backends()[0]
+    if backend == "msgspec":
+        decode = _msgspec_decoder()
+    else:
+        decode = _loads_decoder(orjson.loads if backend == "orjson" else json.loads)
+    if not skip_not_final:
+        return decode
+
+    def decode_final(msg):
+        if (NOT_FINAL_BYTES if isinstance(msg, bytes) else NOT_FINAL) in msg:
+            return None
+        return decode(msg)
+    return decode_final
+
+
+def _trade_msgspec_decoder():
+    decoder = msgspec.json.Decoder(AggTradeFrame, strict=False)
+
+    def decode(msg):
+        t = decoder.decode(msg).data
+        return t.s, t.p, t.T
+    return decode
+
+
+def _trade_loads_decoder(loads):
+    def decode(msg):
+        t = loads(msg)["data"]
+        return t["s"], float(t["p"]), t["T"]
+    return decode
+
+
+def make_trade_decoder(backend=None):
+    """Combined-stream aggTrade frame -> (SYMBOL, price, trade time ms)"""
+    backend = backend or available_backends()[0]
+    if backend == "msgspec":
+        return _trade_msgspec_decoder()
+    return _trade_loads_decoder(orjson.loads if backend == "orjson" else json.loads)
+
+
+decode_kline = make_decoder()
+decode_trade = make_trade_decoder()
@@ -0,0 +1,165 @@
+import asyncio
+import os
+import random
+import time
+
+import requests
+import websockets
+
+from candle_aggregator import TIMEFRAME_MS
+from event_log import events
+from kline_decode import decode_kline
+from latency import latency
+
+BINANCE_WS_URL = os.getenv('BINANCE_WS_URL', 'wss://stream.binance.com:9443/stream?streams=')
+BINANCE_REST_URL = os.getenv('BINANCE_REST_URL', 'https://api.binance.com/api/v3/klines')
+# Binance allows up to 1024 streams per connection; smaller shards keep one
+# connection (and one reconnect) from carrying too much of the market
+STREAMS_PER_CONNECTION = int(os.getenv('STREAMS_PER_CONNECTION', '200'))
+RECONNECT_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+KLINE_QUEUE_SIZE = 10_000
+
+
+def parse_rest_kline(symbol, row):
+    """Row of the Binance /klines REST response -> our kline dict"""
+    return {
+        "s": symbol.lower(), "o": float(row[1]), "h": float(row[2]), "l": float(row[3]), "c": float(row[4]),
+        "t": row[0], "T": row[6], "v": float(row[5]),
+    }
+
+
+class BinanceKlines:
+    """Closed candles from the Binance /klines REST endpoint, for backfills"""
+
+    def __init__(self, url=BINANCE_REST_URL, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self, symbol, interval, start_time):
+        """Candles of `symbol` opened at or after `start_time` (ms) and already closed"""
+        klines = []
+        now = int(time.time() * 1000)
+        while True:
+            r = self.session.get(self.url, timeout=self.timeout, params=dict(
+                symbol=symbol.upper(), interval=interval, startTime=start_time, limit=1000,
+            ))
+            r.raise_for_status()
+            rows = r.json()
+            klines.extend(parse_rest_kline(symbol, row) for row in rows if row[6] < now)
+            if len(rows) < 1000:
+                return klines
+            start_time = rows[-1][6] + 1
+
+
+async def stream_forever(url, on_message, name, on_reconnect=None):
+    """
+    Reads a websocket forever, awaiting `on_message(msg)` per frame.
+    A dropped connection is reopened with jittered exponential backoff;
+    `on_reconnect()` is awaited on every connection after the first one.
+    """
+    delay = RECONNECT_DELAY
+    connected_before = False
+    while True:
+        try:
+            async with websockets.connect(url, max_queue=None) as ws:
+                events.info("ingest.connected", stream=name)
+                if connected_before and on_reconnect is not None:
+                    await on_reconnect()
+                connected_before = True
+                async for msg in ws:
+                    await on_message(msg)
+                    delay = RECONNECT_DELAY
+            events.warning("ingest.disconnected", stream=name, error="closed", retry_in=delay)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            events.warning("ingest.disconnected", stream=name, error=repr(e), retry_in=delay)
+        await asyncio.sleep(delay * (1 + random.random() / 2))
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+
+class KlineIngest:
+    """
+    Closed klines of many symbols from several Binance websocket connections.
+
+    Symbols are split into shards of `per_connection` streams, each read by
+    its own connection task; all of them put closed candles into one
+    `queue`. A dropped connection is reopened with exponential backoff, and
+    candles missed while it was down (or skipped by the stream) are fetched
+    over REST before live ones, so every symbol gets each closed candle
+    exactly once and in order.
+    """
+
+    def __init__(self, symbols, interval="1m", per_connection=STREAMS_PER_CONNECTION,
+                 rest=None, queue_size=KLINE_QUEUE_SIZE):
+        self.symbols = [s.lower() for s in symbols]
+        self.interval = interval
+        self.interval_ms = TIMEFRAME_MS[interval]
+        self.shards = [
+            self.symbols[i:i + per_connection] for i in range(0, len(self.symbols), per_connection)
+        ]
+        self.rest = rest or BinanceKlines()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.last_close = {}
+        self._tasks = []
+
+    def url(self, shard):
+        return BINANCE_WS_URL + "/".join(f"{s}@kline_{self.interval}" for s in shard)
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._run_shard(n, shard)) for n, shard in enumerate(self.shards)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def _run_shard(self, n, shard):
+        async def on_reconnect():
+            await self._backfill(shard)
+        await stream_forever(self.url(shard), self._on_message, f"kline/{n}", on_reconnect)
+
+    async def _on_message(self, msg):
+        received = time.time()
+        started = time.perf_counter()
+        kline = decode_kline(msg)
+        if kline is None:
+            return
+        ticker = kline["s"].upper()
+        latency.since("decode", ticker, started)
+        latency.observe("ws_receive", ticker, received - kline["T"] / 1000)
+
+        last = self.last_close.get(kline["s"])
+        if last is not None and kline["T"] - last > self.interval_ms:
+            await self._backfill([kline["s"]])
+        await self._put(kline)
+
+    async def _backfill(self, symbols):
+        for symbol in symbols:
+            last = self.last_close.get(symbol)
+            if last is None:
+                continue
+            try:
+                klines = await asyncio.to_thread(self.rest.fetch, symbol, self.interval, last + 1)
+            except Exception as e:
+                events.error("ingest.backfill_failed", symbol=symbol, error=repr(e))
+                continue
+            if klines:
+                events.info("ingest.backfill", symbol=symbol, klines=len(klines))
+            for kline in klines:
+                await self._put(kline)
+
+    async def _put(self, kline):
+        # drops duplicates between the REST backfill and the live stream
+        last = self.last_close.get(kline["s"])
+        if last is not None and kline["T"] <= last:
+            return
+        self.last_close[kline["s"]] = kline["T"]
+        await self.queue.put(kline)
@@ -0,0 +1,105 @@
+import heapq
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore, MINUTE_MS, to_ms
+from ohlcv_download import CANDLES_DIR, COLUMNS, partition_symbol
+from replay_file import ReplayWriter, read_replay
+
+
+def merge_klines(*sources):
+    """
+    One close-time ordered kline stream from any number of sources, each
+    an iterable of kline dicts ordered by "T" (a ticker's candles, a replay
+    file, a recorded stream). A heap holds the next kline of every source,
+    so memory grows with the number of sources, not with their length;
+    sources may have gaps and different lengths. Klines closing at the
+    same time come out in source order. A source going back in time
+    raises ValueError.
+    """
+    return heapq.merge(*(_ordered(source, n) for n, source in enumerate(sources)), key=_close_time)
+
+
+def _close_time(kline):
+    return kline["T"]
+
+
+def _ordered(source, n):
+    last = None
+    for kline in source:
+        close_time = kline["T"]
+        if last is not None and close_time < last:
+            raise ValueError(f"source {n} is not ordered by close time: {close_time} after {last} ({kline['s']})")
+        last = close_time
+        yield kline
+
+
+def store_sources(store, tickers=None, start=None, end=None):
+    """One source per ticker of a CandleStore (all of them by default)"""
+    return [store.klines(ticker, start, end) for ticker in (store.tickers() if tickers is None else tickers)]
+
+
+def dataset_source(ticker, root=CANDLES_DIR, start=None, end=None):
+    """
+    Klines of one ticker of the ohlcv_download dataset, read one partition
+    file at a time in time order
+    """
+    ticker_dir = os.path.join(root, f"symbol={partition_symbol(ticker)}")
+    start, end = to_ms(start), to_ms(end)
+    parts = []
+    for month in os.listdir(ticker_dir):
+        for name in os.listdir(os.path.join(ticker_dir, month)):
+            if name.endswith(".parquet"):
+                first, last = (int(x) for x in name[:-len(".parquet")].split("-"))
+                if (start is None or last >= start) and (end is None or first <= end):
+                    parts.append((first, os.path.join(ticker_dir, month, name)))
+    for _, path in sorted(parts):
+        yield from frame_source(pd.read_parquet(path, columns=COLUMNS), start, end)
+
+
+def frame_source(df, start=None, end=None):
+    """Klines of a one-ticker DataFrame in the parquet layout (ticker, datetime, open, ...)"""
+    df = df.sort_values("datetime", kind="stable")
+    open_time = df["datetime"].to_numpy("datetime64[ms]").astype(np.int64)
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= open_time >= to_ms(start)
+    if end is not None:
+        keep &= open_time <= to_ms(end)
+    columns = [open_time[keep]] + [df[name].to_numpy(np.float64)[keep] for name in COLUMNS[2:]]
+    symbols = df["ticker"].astype(str).str.replace("/", "").str.lower().to_numpy()[keep]
+    for s, t, o, h, l, c, v in zip(symbols.tolist(), *(column.tolist() for column in columns)):
+        yield {"s": s, "t": t, "T": t + MINUTE_MS - 1, "o": o, "h": h, "l": l, "c": c, "v": v}
+
+
+def frame_sources(df):
+    """One source per ticker of a multi-ticker DataFrame, e.g. a notebook's `plot_df`"""
+    return [frame_source(g) for _, g in df.groupby("ticker", sort=False, observed=True)]
+
+
+def write_replay(klines, path):
+    """Writes a kline stream (e.g. `merge_klines(...)`) to a binary replay file; returns the record count"""
+    with ReplayWriter(path) as writer:
+        for kline in klines:
+            writer.write(kline)
+    return writer.count
+
+
+def open_sources(path, tickers=None):
+    """Sources of a CandleStore directory, an ohlcv_download dataset or a replay file"""
+    if not os.path.isdir(path):
+        return [read_replay(path)]
+    store = CandleStore(path)
+    if store.tickers():
+        return store_sources(store, [t for t in store.tickers() if tickers is None or t.lower() in tickers])
+    names = sorted(name[len("symbol="):] for name in os.listdir(path) if name.startswith("symbol="))
+    return [dataset_source(name, path) for name in names if tickers is None or name.lower() in tickers]
+
+
+if __name__ == "__main__":
+    # python kline_merge.py out.replay candle_store [candles_1m other.replay ...]
+    n = write_replay(merge_klines(*(source for path in sys.argv[2:] for source in open_sources(path))), sys.argv[1])
+    print(f"{n} records written to {sys.argv[1]}")
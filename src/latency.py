@@ -0,0 +1,190 @@
+import asyncio
+import bisect
+import json
+import os
+import threading
+import time
+
+from event_log import events
+
+# periodic dump of the latency summaries to the event log, 0 disables it
+LATENCY_DUMP_INTERVAL = float(os.getenv('LATENCY_DUMP_INTERVAL', '60'))
+# local metrics endpoint (Prometheus text on /metrics, json on /json), 0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# bucket upper bounds in seconds: 1us .. ~110s, 4 buckets per doubling (~19% resolution)
+BUCKETS = tuple(1e-6 * 2 ** (i / 4) for i in range(108))
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Fixed log-bucket latency histogram, O(log buckets) per observation"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (capped at the observed max)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("recorder", "stage", "symbol", "started")
+
+    def __init__(self, recorder, stage, symbol):
+        self.recorder = recorder
+        self.stage = stage
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.since(self.stage, self.symbol, self.started)
+
+
+class LatencyRecorder:
+    """
+    In-process latency histograms per (stage, symbol).
+
+    Stages of the live loop: ws_receive (candle close to receive),
+    decode, process_kline, positions, get_price, place_order,
+    get_position, send_notification and close_to_ack (candle close to
+    the exchange acknowledging our order). Observations may come from the
+    order gateway's threads, so updates take a lock.
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, symbol, seconds):
+        key = (stage, symbol)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def since(self, stage, symbol, started):
+        """Observes the time elapsed from a `time.perf_counter()` reading"""
+        self.observe(stage, symbol, time.perf_counter() - started)
+
+    def timer(self, stage, symbol):
+        """`with latency.timer("decode", symbol): ...`"""
+        return _Timer(self, stage, symbol)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.started_at = time.time()
+
+    def summary(self):
+        """
+        Rows {stage, symbol, count, mean_ms, p50_ms, p90_ms, p99_ms, max_ms};
+        symbol "*" aggregates all symbols of a stage
+        """
+        with self._lock:
+            items = [(key, _copy(hist)) for key, hist in self.histograms.items()]
+
+        stages = {}
+        for (stage, _), hist in items:
+            stages.setdefault(stage, Histogram()).merge(hist)
+        items += [((stage, "*"), hist) for stage, hist in stages.items()]
+
+        rows = []
+        for (stage, symbol), hist in sorted(items, key=lambda item: item[0]):
+            row = dict(stage=stage, symbol=symbol, count=hist.count,
+                       mean_ms=round(1000 * hist.total / hist.count, 3) if hist.count else 0.0)
+            for q in QUANTILES:
+                row[f"p{round(q * 100)}_ms"] = round(1000 * hist.quantile(q), 3)
+            row["max_ms"] = round(1000 * hist.max, 3)
+            rows.append(row)
+        return rows
+
+    def dump(self):
+        """Writes the per-stage summaries (all symbols) to the event log"""
+        for row in self.summary():
+            if row["symbol"] == "*":
+                events.info("latency", **row)
+
+    async def run_dump(self, interval=LATENCY_DUMP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.dump()
+
+    def prometheus(self):
+        """Summaries in the Prometheus text exposition format"""
+        lines = [
+            "# HELP fireflyx_latency_seconds Stage latency of the trading loop",
+            "# TYPE fireflyx_latency_seconds summary",
+        ]
+        for row in self.summary():
+            labels = f'stage="{row["stage"]}",symbol="{row["symbol"]}"'
+            for q in QUANTILES:
+                lines.append(f'fireflyx_latency_seconds{{{labels},quantile="{q}"}} {row[f"p{round(q * 100)}_ms"] / 1000}')
+            lines.append(f"fireflyx_latency_seconds_count{{{labels}}} {row['count']}")
+            lines.append(f"fireflyx_latency_seconds_sum{{{labels}}} {row['mean_ms'] * row['count'] / 1000}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Minimal HTTP endpoint: GET /metrics (Prometheus) or GET /json"""
+        async def handle(reader, writer):
+            try:
+                request = (await reader.readline()).decode(errors="replace").split()
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                path = request[1] if len(request) > 1 else "/"
+                if path.startswith("/json"):
+                    body, content_type = json.dumps(self.summary()), "application/json"
+                else:
+                    body, content_type = self.prometheus(), "text/plain; version=0.0.4"
+                body = body.encode()
+                writer.write(
+                    f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+def _copy(hist):
+    copy = Histogram()
+    copy.merge(hist)
+    return copy
+
+
+latency = LatencyRecorder()
@@ -1,18 +1,36 @@
 import asyncio
-import websockets
-import json
 import os
-from pybit.unified_trading import HTTP
-from pump_monitor import PumpMonitor, PumpState
+import time
+from functools import partial
+from pybit.unified_trading import HTTP, WebSocket
+from pump_table import PumpTable
 from order_manager import FuturesOrders
-from aiogram_bot import send_notification, format_position_close_notification, format_position_open_notification
+from position_ledger import PositionLedger
+from instrument_filters import load_filters
+from quote_cache import QuoteCache
+from order_gateway import OrderGateway
+from strategy import decide, OPEN, CLOSE
+from pump_monitor import PumpState
+from event_log import events
+from latency import latency, LATENCY_DUMP_INTERVAL, METRICS_PORT
+from kline_ingest import KlineIngest
+from candle_aggregator import CandleAggregator
+from trade_stream import IntraCandleDetector, TradeStream
+from pump_checkpoint import load_checkpoint, save_checkpoint, run_checkpoints, catch_up
+from aiogram_bot import PRIORITY_CLOSE, PRIORITY_OPEN, send_notification, start_notifications, stop_notification_fanout, format_position_close_notification, format_position_open_notification
 
 API_KEY = os.getenv('API_KEY')
 SECRET_KEY = os.getenv('SECRET_KEY')
 cl = HTTP(api_key=API_KEY, api_secret=SECRET_KEY, demo=True)
 
-BASE_POSITION = 1000
-MAX_POSITIONS = 3
+POSITIONS_RECONCILE_INTERVAL = 30
+# STARTED from the aggTrade stream as soon as the threshold is crossed inside the candle
+INTRA_CANDLE_START = os.getenv('INTRA_CANDLE_START', '0') == '1'
+# extra monitors on aggregated candles, "timeframe:pump_started_condition,...", e.g. "15m:0.03,1h:0.05"
+MONITOR_TIMEFRAMES = [
+    (tf, float(cond)) for tf, cond in
+    (item.split(":") for item in os.getenv('MONITOR_TIMEFRAMES', '').split(",") if item)
+]
 
 tickers_mapping = {
     "btcusdt": 1,
@@ -25,83 +43,125 @@ tickers_mapping = {
 }
 
 tickers = list(tickers_mapping.keys())
-streams = "/".join([f"{t}@kline_1m" for t in tickers])
-url = f"wss://stream.binance.com:9443/stream?streams={streams}"
 
-monitoring = {
-    s: PumpMonitor(s, pump_started_condition=0.01) for s in tickers
-}
+monitoring = PumpTable(tickers, pump_started_condition=0.01)
+ledger = PositionLedger(cl)
+quotes = QuoteCache()
+filters = load_filters(cl)
 orders = {
-    s: FuturesOrders(cl, s.upper()) for s in tickers
+    s: FuturesOrders(cl, s.upper(), ledger=ledger, filters=filters, quotes=quotes) for s in tickers
 }
+gateway = OrderGateway(orders)
+ingest = KlineIngest(tickers)
+aggregator = CandleAggregator(sorted({tf for tf, _ in MONITOR_TIMEFRAMES}))
+for tf, cond in MONITOR_TIMEFRAMES:
+    aggregator.attach(tf, PumpTable(tickers, pump_started_condition=cond, timeframe=tf))
 
 async def listen():
-    async with websockets.connect(url) as ws:
-        while True:
-            msg = await ws.recv()
-            raw = json.loads(msg)
-            data = raw["data"]["k"]
-            
-            if not data["x"]:
-                continue
-                
-            # Convert Binance WebSocket format to our kline format
-            kline = {
-                "s": data["s"].lower(),  # Symbol in lowercase
-                "o": data["o"],          # Open price
-                "c": data["c"],          # Close price
-                "t": data["t"],          # Open time
-                "T": data["T"],          # Close time
-                "v": data["v"]           # Volume
-            }
-            
-            print("Внешний принт свечи:")
-            print(kline)
-            print("Внутренний принт обработки:")
-            
-            symbol = kline["s"]
-            monitoring[symbol].process_kline(kline)
+    while True:
+        kline = await ingest.get()
+        symbol = kline["s"]
+        events.debug("engine.kline", **kline)
+
+        with latency.timer("process_kline", symbol.upper()):
+            state = monitoring.process_kline(kline)
+        act(symbol, state, kline["T"])
+        # higher timeframe monitors only report their states for now
+        aggregator.process(kline)
+
+def on_early_start(symbol, trade_time):
+    act(symbol, PumpState.STARTED, trade_time)
+
+# built after on_early_start is defined
+trades = TradeStream(IntraCandleDetector(monitoring), on_early_start) if INTRA_CANDLE_START else None
+
+def act(symbol, state, signal_time):
+    """Trading decision for the symbol's new state, orders go to its gateway worker"""
+    ticker = symbol.upper()  # as on Bybit
+    # a symbol with orders still in flight is decided again on its next candle
+    if gateway.pending(symbol):
+        return
+    started = time.perf_counter()
+    in_flight = sum(1 for s in gateway.pending_symbols() if not ledger.get(s.upper()))
+    n_positions = ledger.n_positions + in_flight
+    pos_im = ledger.position_value(ticker)
+    latency.since("positions", ticker, started)
+
+    # Trading logic
+    action, quote = decide(state, pos_im, n_positions)
+    if action:
+        gateway.submit(symbol, partial(execute, symbol, action, quote, state, signal_time))
+
+async def execute(symbol, action, quote, state, signal_time):
+    """
+    Order and notification of one decision, run by the symbol's gateway worker.
+    signal_time: close time (ms) of the candle that triggered it, or the trade
+    time of an intra-candle start, for close_to_ack latency
+    """
+    if action == CLOSE:
+        position_details = await gateway.call(symbol, "get_position")
+        await gateway.call(symbol, "close_position")
+        latency.observe("close_to_ack", symbol.upper(), time.time() - signal_time / 1000)
+        
+        message = format_position_close_notification(symbol, position_details)
+        with latency.timer("send_notification", symbol.upper()):
+            send_notification(message, PRIORITY_CLOSE)
+        
+    elif action == OPEN:
+        await gateway.call(symbol, "place_market_order_by_quote", quote, side="buy")
+        latency.observe("close_to_ack", symbol.upper(), time.time() - signal_time / 1000)
+        
+        position_details = await gateway.call(symbol, "get_position")
+        message = format_position_open_notification(
+            symbol, position_details, state, quote
+        )
+        with latency.timer("send_notification", symbol.upper()):
+            send_notification(message, PRIORITY_OPEN)
 
-            state = monitoring[symbol].state 
-            n_positions = len(cl.get_positions(category="linear", settleCoin="USDT")["result"]["list"])
-            pos_im = float(cl.get_positions(category="linear", symbol=symbol.upper())["result"]["list"][0]["positionValue"] or 0)
+async def restore_monitoring():
+    """Warm restart: last snapshot of the monitors plus the candles missed since"""
+    snapshot = load_checkpoint()
+    if snapshot is None:
+        return
+    restored = monitoring.restore(snapshot)
+    events.info("checkpoint.restored", symbols=restored, running=len(monitoring.traces))
+    await catch_up(monitoring, ingest.rest)
+    # the stream continues after the replayed candles, gaps are backfilled by the ingest
+    ingest.last_close.update(monitoring.last_closes())
 
-            # Trading logic
-            if state in [PumpState.COOLING_OFF, PumpState.DUMPED, PumpState.RETESTED] and pos_im > 0:
-                position_details = orders[symbol].get_position()
-                orders[symbol].close_position()
-                
-                message = format_position_close_notification(symbol, position_details)
-                send_notification(message)
-                
-            elif n_positions < MAX_POSITIONS or pos_im > 0:
-                print('-'*50, pos_im, '-'*50)
-                if state == PumpState.STARTED and pos_im < BASE_POSITION/2 * 0.9:
-                    orders[symbol].place_market_order_by_quote(BASE_POSITION/2, side="buy")
-                    
-                    position_details = orders[symbol].get_position()
-                    message = format_position_open_notification(
-                        symbol, position_details, "STARTED", BASE_POSITION/2
-                    )
-                    send_notification(message)
-                        
-                elif state == PumpState.CONFIRMED and pos_im < BASE_POSITION * 0.9:
-                    orders[symbol].place_market_order_by_quote(BASE_POSITION/2, side="buy")
-                    
-                    position_details = orders[symbol].get_position()
-                    message = format_position_open_notification(
-                        symbol, position_details, "CONFIRMED", BASE_POSITION/2
-                    )
-                    send_notification(message)
-                        
-                elif state == PumpState.STABILIZED and pos_im < BASE_POSITION * 0.9: 
-                    orders[symbol].place_market_order_by_quote(BASE_POSITION, side="buy")
-                    
-                    position_details = orders[symbol].get_position()
-                    message = format_position_open_notification(
-                        symbol, position_details, "STABILIZED", BASE_POSITION
-                    )
-                    send_notification(message)
+async def main():
+    await restore_monitoring()
+    ledger.reconcile()
+    ws_private = WebSocket(testnet=False, demo=True, channel_type="private", api_key=API_KEY, api_secret=SECRET_KEY)
+    ledger.subscribe(ws_private)
+    ws_public = WebSocket(testnet=False, channel_type="linear")
+    quotes.subscribe(ws_public, [s.upper() for s in tickers])
+    reconciliation = asyncio.create_task(ledger.run_reconciliation(POSITIONS_RECONCILE_INTERVAL))
+    tasks = [reconciliation, asyncio.create_task(run_checkpoints(monitoring))]
+    if LATENCY_DUMP_INTERVAL:
+        tasks.append(asyncio.create_task(latency.run_dump(LATENCY_DUMP_INTERVAL)))
+    metrics = await latency.serve(port=METRICS_PORT) if METRICS_PORT else None
+    await start_notifications()
+    await ingest.start()
+    if trades:
+        await trades.start()
+    try:
+        await listen()
+    finally:
+        await ingest.stop()
+        if trades:
+            await trades.stop()
+        save_checkpoint(monitoring.snapshot())
+        for task in tasks:
+            task.cancel()
+        if metrics:
+            metrics.close()
+        latency.dump()
+        await gateway.close()
+        # after the gateway, so notifications of the last orders are still sent
+        await stop_notification_fanout()
+        ws_private.exit()
+        ws_public.exit()
 
 if __name__ == "__main__":
-    asyncio.run(listen())
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1,82 +1,109 @@
 import os
+import sys
 import json
 import time
-from pybit.unified_trading import HTTP
-from pump_monitor import PumpMonitor, PumpState
+from itertools import groupby, islice
+from pump_table import PumpTable
 from order_manager import FuturesOrders
-from aiogram_bot import send_notification, format_position_close_notification, format_position_open_notification
+from sim_exchange import SimulatedHTTP
+from instrument_filters import load_filters, FILTERS_CACHE_PATH
+from strategy import decide, OPEN, CLOSE
+from event_log import events, DEBUG
+from latency import latency
+from kline_merge import merge_klines, open_sources
+from replay_file import is_replay_file, read_replay
+from aiogram_bot import PRIORITY_CLOSE, PRIORITY_OPEN, send_notification, format_position_close_notification, format_position_open_notification
 
 API_KEY = os.getenv('API_KEY')
 SECRET_KEY = os.getenv('SECRET_KEY')
 
-cl = HTTP(api_key=API_KEY, api_secret=SECRET_KEY, demo=True)
+# "local" replays against the in-process SimulatedHTTP, "demo" against the Bybit demo API
+SIMULATION_EXCHANGE = os.getenv('SIMULATION_EXCHANGE', 'local')
+# delay between candles in seconds, 0 replays at full speed
+REPLAY_DELAY = float(os.getenv('REPLAY_DELAY', '0'))
+# records skipped at the start of the input, as the original replay did
+REPLAY_START = int(os.getenv('REPLAY_START', '14180'))
+NOTIFY = os.getenv('SIMULATION_NOTIFY', '0') == '1'
 
-BASE_POSITION = 1000
-MAX_POSITIONS = 3
+if SIMULATION_EXCHANGE == 'local':
+    cl = SimulatedHTTP()
+else:
+    from pybit.unified_trading import HTTP
+    cl = HTTP(api_key=API_KEY, api_secret=SECRET_KEY, demo=True)
 
 symbols = ["solusdt", "ethusdt", "mntusdt", "xrpusdt", "adausdt", "dogeusdt"]
 
-monitoring = {
-    s: PumpMonitor(s, pump_started_condition=0.01) for s in symbols
-}
+monitoring = PumpTable(symbols, pump_started_condition=0.01)
+filters = load_filters(cl, cache_path=None if SIMULATION_EXCHANGE == 'local' else FILTERS_CACHE_PATH)
 orders = {
-    s: FuturesOrders(cl, s.upper()) for s in symbols
+    s: FuturesOrders(cl, s.upper(), filters=filters) for s in symbols
 }
 
+def load_records(path):
+    """
+    Klines of a binary replay file, streamed from REPLAY_START on, of a candles JSON,
+    or of the simulated symbols of a CandleStore / ohlcv_download dataset merged in time order
+    """
+    if os.path.isdir(path):
+        return islice(merge_klines(*open_sources(path, symbols)), REPLAY_START, None)
+    if is_replay_file(path):
+        return read_replay(path, start=REPLAY_START)
+    with open(path, "r") as f:
+        return json.load(f)[REPLAY_START:]
+
+
 def run_simulation(records):
-    for kline in records[14180:]: # records[14180:]
-        if not all(k in kline for k in ("s", "o", "c")):
-            continue
-        print("Внешний принт свечи:")
-        print(kline)
-        print("Внутренний принт обработки:")
-        symbol = kline["s"]
-        monitoring[symbol].process_kline(kline)
+    records = (
+        kline for kline in records
+        if all(k in kline for k in ("s", "o", "c"))
+    )
+    # candles closed in the same minute go through the state table in one step
+    for _, batch in groupby(records, key=lambda kline: kline.get("T", kline.get("datetime"))):
+        batch = list(batch)
+        if events.debug_enabled:
+            events.event(DEBUG, "simulation.batch", klines=batch)
+        if SIMULATION_EXCHANGE == 'local':
+            for kline in batch:
+                cl.set_price(kline["s"].upper(), float(kline["c"]))
+        with latency.timer("process_klines", "batch"):
+            states = monitoring.process_klines(batch)
+
+        for kline, state in zip(batch, states):
+            trade(kline["s"], state)
 
-        state = monitoring[symbol].state 
-        n_positions = len(cl.get_positions(category="linear", settleCoin="USDT")["result"]["list"])
-        pos_im = float(cl.get_positions(category="linear", symbol=symbol.upper())["result"]["list"][0]["positionValue"] or 0)
+    if SIMULATION_EXCHANGE == 'local':
+        print(cl.summary())
+    latency.dump()
 
+
+def trade(symbol, state):
+    n_positions = len(cl.get_positions(category="linear", settleCoin="USDT")["result"]["list"])
+    pos_im = float(cl.get_positions(category="linear", symbol=symbol.upper())["result"]["list"][0]["positionValue"] or 0)
+
+    action, quote = decide(state, pos_im, n_positions)
+    if action == CLOSE:
+        position_details = orders[symbol].get_position()
+        orders[symbol].close_position()
         
-        if state in [PumpState.COOLING_OFF, PumpState.DUMPED, PumpState.RETESTED] and pos_im > 0:
-            position_details = orders[symbol].get_position()
-            orders[symbol].close_position()
-            
+        if NOTIFY:
             message = format_position_close_notification(symbol, position_details)
-            send_notification(message)
-            
-        elif n_positions < MAX_POSITIONS or pos_im > 0:
-            print('-'*50, pos_im, '-'*50)
-            if state == PumpState.STARTED and pos_im < BASE_POSITION/2 * 0.9:
-                orders[symbol].place_market_order_by_quote(BASE_POSITION/2, side="buy")
-                
-                position_details = orders[symbol].get_position()
-                message = format_position_open_notification(
-                    symbol, position_details, "STARTED", BASE_POSITION/2
-                )
-                send_notification(message)
-                    
-            elif state == PumpState.CONFIRMED and pos_im < BASE_POSITION * 0.9:
-                orders[symbol].place_market_order_by_quote(BASE_POSITION/2, side="buy")
-                
-                position_details = orders[symbol].get_position()
-                message = format_position_open_notification(
-                    symbol, position_details, "CONFIRMED", BASE_POSITION/2
-                )
-                send_notification(message)
-                    
-            elif state == PumpState.STABILIZED and pos_im < BASE_POSITION * 0.9: 
-                orders[symbol].place_market_order_by_quote(BASE_POSITION, side="buy")
-                
-                position_details = orders[symbol].get_position()
-                message = format_position_open_notification(
-                    symbol, position_details, "STABILIZED", BASE_POSITION
-                )
-                send_notification(message)
+            send_notification(message, PRIORITY_CLOSE)
+        
+    elif action == OPEN:
+        orders[symbol].place_market_order_by_quote(quote, side="buy")
+        
+        position_details = orders[symbol].get_position()
+        if NOTIFY:
+            message = format_position_open_notification(
+                symbol, position_details, state, quote
+            )
+            send_notification(message, PRIORITY_OPEN)
 
-        time.sleep(1)
+    if REPLAY_DELAY:
+        time.sleep(REPLAY_DELAY)
 
 if __name__ == "__main__":
-    with open("/home/koshkidadanet/My Files/FireflyX/candles_data/allusdt.json", "r") as f:
-        data = json.load(f)
-    run_simulation(data)
\ No newline at end of file
+    if len(sys.argv) < 2:
+        sys.exit("usage: python main_simulation.py <candles .json | .replay | candle store or dataset directory>")
+    path = sys.argv[1]
+    run_simulation(load_records(path))
\ No newline at end of file
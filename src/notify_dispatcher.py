@@ -0,0 +1,170 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from aiogram.exceptions import TelegramForbiddenError
+
+from event_log import events
+from latency import latency
+from order_gateway import TokenBucket
+
+# lower goes first
+PRIORITY_CLOSE = 0
+PRIORITY_OPEN = 1
+PRIORITY_INFO = 2
+
+# Telegram allows about one message per second to a chat, with short bursts
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+# pending messages sent together as one digest message
+DIGEST_WINDOW = 0.5
+DIGEST_MAX_MESSAGES = 10
+MESSAGE_MAX_LENGTH = 4096
+MAX_RETRIES = 5
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications to one chat within Telegram's rate limits.
+
+    Messages wait in a priority queue (closes before opens before the
+    rest). The sender takes a token from a TokenBucket, waits
+    `window` seconds to let a burst accumulate and sends everything
+    pending as one digest (up to `max_digest` messages). Flood-control
+    errors are retried after the `retry_after` the server asks for,
+    other errors with exponential backoff up to `max_retries` times.
+    """
+
+    def __init__(self, bot, chat_id, rate=CHAT_RATE, burst=CHAT_BURST, window=DIGEST_WINDOW,
+                 max_digest=DIGEST_MAX_MESSAGES, max_retries=MAX_RETRIES, global_limiter=None, on_drop=None):
+        """
+        global_limiter: TokenBucket shared by the dispatchers of all chats, taken per send attempt
+        on_drop: on_drop(chat_id, error) after a message was given up on
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.limiter = TokenBucket(rate, burst)
+        self.global_limiter = global_limiter
+        self.on_drop = on_drop
+        self.window = window
+        self.max_digest = max_digest
+        self.max_retries = max_retries
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._sending = False
+        self.stats = dict(submitted=0, sent=0, messages=0, digests=0, retries=0, dropped=0)
+
+    def submit(self, text, priority=PRIORITY_INFO):
+        """Queues a message and returns at once (call on the dispatcher's loop)"""
+        heapq.heappush(self._heap, (priority, next(self._seq), time.time(), text))
+        self.stats["submitted"] += 1
+        self._wakeup.set()
+
+    def pending(self):
+        return len(self._heap)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def close(self, drain=True, timeout=30.0):
+        """Stops the sender; with `drain` sends what is still queued first"""
+        if drain and (self._heap or self._sending):
+            try:
+                await asyncio.wait_for(self._drained(), timeout)
+            except asyncio.TimeoutError:
+                events.warning("notify.drain_timeout", chat_id=self.chat_id, pending=len(self._heap))
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _drained(self):
+        while self._heap or self._sending:
+            await asyncio.sleep(0.05)
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await self.limiter.acquire()
+            if self.window:
+                await asyncio.sleep(self.window)
+            batch = self._take()
+            self._sending = True
+            try:
+                await self._send(batch)
+            finally:
+                self._sending = False
+
+    def _take(self):
+        """Highest priority messages that fit one message, oldest first within a priority"""
+        batch = []
+        length = 0
+        while self._heap and len(batch) < self.max_digest:
+            text = self._heap[0][3]
+            if batch and length + len(text) + 2 > MESSAGE_MAX_LENGTH:
+                break
+            batch.append(heapq.heappop(self._heap))
+            length += len(text) + 2
+        return batch
+
+    async def _send(self, batch):
+        if len(batch) == 1:
+            text = batch[0][3]
+        else:
+            text = "\n\n".join(item[3] for item in batch)
+        text = text[:MESSAGE_MAX_LENGTH]
+
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            if self.global_limiter is not None:
+                await self.global_limiter.acquire()
+            try:
+                started = time.perf_counter()
+                await self.bot.send_message(self.chat_id, text)
+                latency.since("notify_send", "*", started)
+                break
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                if attempt == self.max_retries or (retry_after is None and not retryable(e)):
+                    self.stats["dropped"] += len(batch)
+                    events.error("notify.dropped", chat_id=self.chat_id, messages=len(batch), error=repr(e))
+                    if self.on_drop is not None:
+                        self.on_drop(self.chat_id, e)
+                    return
+                self.stats["retries"] += 1
+                wait = float(retry_after) if retry_after is not None else delay
+                events.warning("notify.retry", chat_id=self.chat_id, retry_in=wait, error=repr(e))
+                await asyncio.sleep(wait)
+                delay = min(delay * 2, 60.0)
+
+        now = time.time()
+        for item in batch:
+            latency.observe("notify_wait", "*", now - item[2])
+        self.stats["sent"] += 1
+        self.stats["messages"] += len(batch)
+        if len(batch) > 1:
+            self.stats["digests"] += 1
+        events.info(
+            "notify.sent", chat_id=self.chat_id, messages=len(batch),
+            wait_ms=round(1000 * (now - min(item[2] for item in batch)), 1),
+        )
+
+
+def retryable(error):
+    """Network and server side errors are retried; bad requests and blocked chats are not"""
+    name = type(error).__name__
+    return name in ("TelegramNetworkError", "TelegramServerError") \
+        or isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+def forbidden(error):
+    """The chat blocked the bot or no longer exists"""
+    return isinstance(error, TelegramForbiddenError) or "chat not found" in str(error).lower()
@@ -0,0 +1,223 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from candle_aggregator import TIMEFRAME_MS
+from event_log import events
+from order_gateway import TokenBucket
+
+try:
+    import ccxt.async_support as ccxt_async
+except ImportError:  # only needed to download from a real exchange
+    ccxt_async = None
+
+# root of the partitioned dataset: <root>/symbol=SOLUSDT/month=2025-03/<first_ms>-<last_ms>.parquet
+CANDLES_DIR = os.getenv('CANDLES_DIR', 'candles_1m')
+OHLCV_EXCHANGE = os.getenv('OHLCV_EXCHANGE', 'binance')
+OHLCV_CONCURRENCY = 8
+OHLCV_PAGE_LIMIT = 1000
+# downloaded rows are written out every this many rows per ticker, so an interrupted run resumes from there
+OHLCV_FLUSH_ROWS = 50_000
+OHLCV_MAX_RETRIES = 5
+# first retry delay in seconds, doubled per attempt
+OHLCV_RETRY_DELAY = 1.0
+
+COLUMNS = ["ticker", "datetime", "open", "high", "low", "close", "volume"]
+# ccxt error classes by name, so the module works without ccxt installed
+RATE_LIMITED = ("RateLimitExceeded", "DDoSProtection")
+RETRYABLE = ("NetworkError", "RateLimitExceeded", "DDoSProtection", "RequestTimeout", "ExchangeNotAvailable")
+
+
+def partition_symbol(ticker):
+    """'SOL/USDT' -> 'SOLUSDT', the partition directory name of a ticker"""
+    return ticker.replace("/", "").replace(":", "_")
+
+
+def last_timestamp(root, ticker):
+    """Open time (ms) of the newest stored candle of `ticker`, None if nothing is stored"""
+    ticker_dir = os.path.join(root, f"symbol={partition_symbol(ticker)}")
+    if not os.path.isdir(ticker_dir):
+        return None
+    months = sorted(name for name in os.listdir(ticker_dir) if name.startswith("month="))
+    for month in reversed(months):
+        parts = [name for name in os.listdir(os.path.join(ticker_dir, month)) if name.endswith(".parquet")]
+        if parts:
+            return max(int(name[:-len(".parquet")].split("-")[1]) for name in parts)
+    return None
+
+
+def write_partitions(root, ticker, rows):
+    """
+    Appends candles [[ms, o, h, l, c, v], ...] (ascending) of one ticker as one
+    new file per month. Files are written under a temporary name and renamed,
+    so a crash never leaves a partial file behind. Returns the written paths.
+    """
+    frame = pd.DataFrame(rows, columns=["ms", "open", "high", "low", "close", "volume"])
+    frame["ms"] = frame["ms"].astype(np.int64)
+    frame.insert(0, "ticker", ticker)
+    frame.insert(1, "datetime", pd.to_datetime(frame["ms"], unit="ms"))
+    months = frame["datetime"].dt.strftime("%Y-%m")
+    paths = []
+    for month, part in frame.groupby(months, sort=True):
+        directory = os.path.join(root, f"symbol={partition_symbol(ticker)}", f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{part['ms'].iloc[0]}-{part['ms'].iloc[-1]}.parquet")
+        tmp = path + ".tmp"
+        part[COLUMNS].to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+def read_candles(root=CANDLES_DIR, tickers=None):
+    """
+    The dataset as one DataFrame in the `03_05_1m.parquet` layout
+    (ticker, datetime, open, high, low, close, volume), sorted by ticker and time
+    """
+    filters = [("symbol", "in", [partition_symbol(t) for t in tickers])] if tickers else None
+    df = pd.read_parquet(root, columns=COLUMNS, filters=filters)
+    df["ticker"] = df["ticker"].astype(str)
+    return df.sort_values(["ticker", "datetime"], ignore_index=True)
+
+
+def retryable(error):
+    """Network errors and rate limiting are retried, anything else (bad symbol, auth) is not"""
+    return any(cls.__name__ in RETRYABLE for cls in type(error).__mro__) \
+        or isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+def rate_limited(error):
+    return any(cls.__name__ in RATE_LIMITED for cls in type(error).__mro__)
+
+
+class OHLCVDownloader:
+    """
+    Downloads 1m OHLCV history of many tickers into the partitioned dataset.
+
+    Tickers are fetched concurrently (`concurrency` at a time), all requests
+    share one TokenBucket at the exchange's `rateLimit`, halved on every
+    rate-limit rejection. Each ticker resumes
+    from its newest stored candle, or starts at `since` when it has none;
+    new candles are appended as new files of their ticker/month partition,
+    stored data is never rewritten. The still open candle is not stored.
+
+    `exchange` is any ccxt async exchange (or a stand-in such as
+    fake_exchange.FakeExchange) with `fetch_ohlcv`, `rateLimit` and
+    `milliseconds`.
+    """
+
+    def __init__(self, exchange, root=CANDLES_DIR, timeframe="1m", concurrency=OHLCV_CONCURRENCY,
+                 limit=OHLCV_PAGE_LIMIT, flush_rows=OHLCV_FLUSH_ROWS, max_retries=OHLCV_MAX_RETRIES,
+                 retry_delay=OHLCV_RETRY_DELAY):
+        self.exchange = exchange
+        self.root = root
+        self.timeframe = timeframe
+        self.interval_ms = TIMEFRAME_MS[timeframe]
+        self.limit = limit
+        self.flush_rows = flush_rows
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.limiter = TokenBucket(1000 / exchange.rateLimit, 1)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.requests = 0
+        self.retries = 0
+
+    async def download(self, tickers, since):
+        """
+        Brings every ticker up to the last closed candle: {ticker: new candles}.
+        since: ms timestamp (or a datetime string) to start tickers that have no data yet
+        """
+        if not isinstance(since, (int, np.integer)):
+            since = int(pd.Timestamp(since).value // 1_000_000)
+        started = time.time()
+        results = await asyncio.gather(
+            *(self._download_ticker(ticker, since) for ticker in tickers), return_exceptions=True
+        )
+        counts = {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, Exception):
+                events.error("ohlcv.ticker_failed", ticker=ticker, error=repr(result))
+            else:
+                counts[ticker] = result
+        events.info(
+            "ohlcv.downloaded", tickers=len(tickers), failed=len(tickers) - len(counts),
+            candles=sum(counts.values()), requests=self.requests, retries=self.retries,
+            seconds=round(time.time() - started, 2),
+        )
+        return counts
+
+    async def _download_ticker(self, ticker, since):
+        async with self._semaphore:
+            last = await asyncio.to_thread(last_timestamp, self.root, ticker)
+            start = since if last is None else last + self.interval_ms
+            pending = []
+            total = 0
+            while True:
+                # candles opened after this one are still forming
+                newest = self.exchange.milliseconds() - self.interval_ms
+                if start > newest:
+                    break
+                fetched = await self._fetch(ticker, start)
+                page = [row for row in fetched if start <= row[0] <= newest]
+                if not page:
+                    break
+                pending.extend(page)
+                start = page[-1][0] + self.interval_ms
+                if len(pending) >= self.flush_rows:
+                    total += await self._flush(ticker, pending)
+                    pending = []
+                if len(fetched) < self.limit:
+                    break
+            if pending:
+                total += await self._flush(ticker, pending)
+            if events.debug_enabled:
+                events.debug("ohlcv.ticker_done", ticker=ticker, candles=total)
+            return total
+
+    async def _flush(self, ticker, rows):
+        paths = await asyncio.to_thread(write_partitions, self.root, ticker, rows)
+        if events.debug_enabled:
+            events.debug("ohlcv.written", ticker=ticker, candles=len(rows), files=len(paths))
+        return len(rows)
+
+    async def _fetch(self, ticker, since):
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.requests += 1
+            try:
+                return await self.exchange.fetch_ohlcv(ticker, self.timeframe, since, self.limit)
+            except Exception as e:
+                if attempt == self.max_retries or not retryable(e):
+                    raise
+                self.retries += 1
+                if rate_limited(e):
+                    # the exchange allows less than its rateLimit says: slow all tickers down
+                    self.limiter.rate = max(self.limiter.rate / 2, 0.1)
+                events.warning("ohlcv.retry", ticker=ticker, since=since, retry_in=delay, error=repr(e))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+
+def make_exchange(name=OHLCV_EXCHANGE):
+    if ccxt_async is None:
+        raise ImportError("ccxt is required to download from an exchange: pip install ccxt")
+    # requests are spaced by the downloader's own limiter, shared by all tickers
+    return getattr(ccxt_async, name)({"enableRateLimit": False})
+
+
+async def main(since, tickers):
+    exchange = make_exchange()
+    try:
+        await OHLCVDownloader(exchange).download(tickers, since)
+    finally:
+        await exchange.close()
+
+
+if __name__ == "__main__":
+    # python ohlcv_download.py 2025-03-01 SOL/USDT DOGE/USDT ...
+    asyncio.run(main(sys.argv[1], sys.argv[2:]))
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+from event_log import events
+
+# Bybit order endpoints allow ~10 requests/s per account for linear
+ORDER_RATE_LIMIT = 10
+ORDER_WORKERS = 8
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` requests per second with bursts up to `capacity`.
+    `acquire` waits on the event loop, `acquire_blocking` in worker threads;
+    both take from the same tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._thread_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+
+    def _take(self):
+        """Takes a token if there is one, otherwise returns the seconds until there is"""
+        with self._state_lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        async with self._lock:
+            while (wait := self._take()) > 0:
+                await asyncio.sleep(wait)
+
+    def acquire_blocking(self):
+        with self._thread_lock:
+            while (wait := self._take()) > 0:
+                time.sleep(wait)
+
+
+class RateLimitedAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter that takes a token from `limiter` before every request it sends"""
+
+    def __init__(self, limiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire_blocking()
+        return super().send(request, **kwargs)
+
+
+class OrderGateway:
+    """
+    Runs the blocking FuturesOrders/pybit calls off the event loop.
+
+    Requests go to a thread pool sharing the client's keep-alive session, so
+    different symbols are served concurrently, while jobs of one symbol run
+    strictly in submission order on a per-symbol worker. Every REST request
+    takes a token from a shared rate limiter first: the pybit session sends
+    through a RateLimitedAdapter, so a method making two requests (e.g.
+    `place_market_order_by_quote`, `close_position`) takes two tokens.
+    Clients without a requests session take one token per method call.
+    """
+
+    def __init__(self, orders, max_workers=ORDER_WORKERS, rate=ORDER_RATE_LIMIT):
+        self.orders = orders
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="orders")
+        self.limiter = TokenBucket(rate)
+        self._queues = {}
+        self._workers = {}
+        self._pending = {}
+        self._limited = set()
+        self._pool_clients(max_workers)
+
+    def _pool_clients(self, max_workers):
+        """Rate limited connection pool of the pybit session sized for the worker threads"""
+        for client in {id(o.cl): o.cl for o in self.orders.values()}.values():
+            session = getattr(client, "client", None)
+            if session is not None and hasattr(session, "mount"):
+                adapter = RateLimitedAdapter(self.limiter, pool_connections=1, pool_maxsize=max_workers)
+                session.mount("https://", adapter)
+                self._limited.add(id(client))
+
+    async def call(self, symbol, method, *args, **kwargs):
+        """Awaits one FuturesOrders method of `symbol` executed in the pool"""
+        if id(self.orders[symbol].cl) not in self._limited:
+            await self.limiter.acquire()
+        fn = partial(getattr(self.orders[symbol], method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn)
+
+    def submit(self, symbol, job):
+        """
+        Queues `job` (coroutine function) for the symbol's worker and returns
+        at once; jobs of one symbol run one after another
+        """
+        if symbol not in self._queues:
+            self._queues[symbol] = asyncio.Queue()
+            self._workers[symbol] = asyncio.create_task(self._worker(symbol))
+        self._pending[symbol] = self._pending.get(symbol, 0) + 1
+        self._queues[symbol].put_nowait(job)
+
+    def pending(self, symbol):
+        """Jobs of the symbol queued or running"""
+        return self._pending.get(symbol, 0)
+
+    def pending_symbols(self):
+        return [s for s, n in self._pending.items() if n]
+
+    async def _worker(self, symbol):
+        queue = self._queues[symbol]
+        while True:
+            job = await queue.get()
+            try:
+                await job()
+            except Exception as e:
+                events.error("gateway.job_failed", symbol=symbol, error=repr(e))
+            finally:
+                self._pending[symbol] -= 1
+                queue.task_done()
+
+    async def drain(self):
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    async def close(self):
+        await self.drain()
+        for worker in self._workers.values():
+            worker.cancel()
+        self.executor.shutdown(wait=True)
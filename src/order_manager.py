@@ -1,23 +1,34 @@
 from pump_monitor import PumpMonitor, PumpState
 
-import decimal
-import inspect
+import sys
 import time
 from typing import Optional
 
 from pybit import exceptions
 
+from instrument_filters import parse_filters
+from event_log import events, INFO
+from latency import latency
+
 class FuturesOrders:
-    def __init__(self, cl, symbol):
+    def __init__(self, cl, symbol, ledger=None, filters=None, quotes=None):
         """
         Конструктор класса и инициализация
         - клиента pybit
         - получение параметров и фильтров Инструмента
+          (из общей таблицы filters, см. instrument_filters.load_filters, иначе запросом)
+        - ledger: PositionLedger, куда сразу записываются наши рыночные ордера
+        - quotes: QuoteCache с потоковыми ценами, см. get_price
         """
         self.cl = cl
         self.symbol = symbol
+        self.ledger = ledger
+        self.quotes = quotes
         self.category = "linear"
-        self.price_decimals, self.qty_decimals, self.min_qty=self.get_filters()
+        if filters and symbol in filters:
+            self.price_decimals, self.qty_decimals, self.min_qty = filters[symbol]
+        else:
+            self.price_decimals, self.qty_decimals, self.min_qty=self.get_filters()
 
     def get_filters(self):
         """
@@ -29,19 +40,24 @@ class FuturesOrders:
         r = self.cl.get_instruments_info(symbol=self.symbol, category=self.category)
         c = r.get('result', {}).get('list', [])[0]
         # print(c)
-        min_qty = c.get('lotSizeFilter', {}).get('minOrderQty', '0.0')
-        qty_decimals = abs(decimal.Decimal(min_qty).as_tuple().exponent)
-        price_decimals = int(c.get('priceScale', '4'))
-        min_qty = float(min_qty)
+        price_decimals, qty_decimals, min_qty = parse_filters(c)
 
         self.log(price_decimals, qty_decimals, min_qty)
         return price_decimals, qty_decimals, min_qty
 
     def get_price(self):
         """
-        Один из способов получения текущей цены
+        Один из способов получения текущей цены:
+        ask из потокового кеша, если он свежий, иначе запросом get_tickers
         """
+        started = time.perf_counter()
+        if self.quotes is not None:
+            r = self.quotes.ask(self.symbol)
+            if r is not None:
+                latency.since("get_price", self.symbol, started)
+                return r
         r = float(self.cl.get_tickers(category=self.category, symbol=self.symbol).get('result').get('list')[0].get('ask1Price'))
+        latency.since("get_price", self.symbol, started)
         self.log(r)
         return r
 
@@ -51,7 +67,8 @@ class FuturesOrders:
         :param key:
         :return:
         """
-        r = self.cl.get_positions(category=self.category, symbol=self.symbol)
+        with latency.timer("get_position", self.symbol):
+            r = self.cl.get_positions(category=self.category, symbol=self.symbol)
         p = r.get('result', {}).get('list', [])[0]
         qty = float(p.get('size', '0.0'))
         if qty <= 0.0: raise Exception("empty position")
@@ -99,11 +116,12 @@ class FuturesOrders:
 
         return r
 
-    def place_market_order_by_base(self, qty : float=0.00001, side : str="Sell"):
+    def place_market_order_by_base(self, qty : float=0.00001, side : str="Sell", price : Optional[float]=None):
         """
         Размещение рыночного ордера с указанием размера ордера в Базовой Валюте (BTC, XRP, etc)
         :param qty:
         :param side:
+        :param price: ожидаемая цена исполнения, для записи в ledger
         :return:
         """
         args = dict(
@@ -116,8 +134,10 @@ class FuturesOrders:
         )
         self.log("args", args)
 
-        r = self.cl.place_order(**args)
+        with latency.timer("place_order", self.symbol):
+            r = self.cl.place_order(**args)
         self.log("result", r)
+        self._record(r, args, price)
 
         return r
 
@@ -131,7 +151,7 @@ class FuturesOrders:
         qty = self.floor_qty(quote / curr_price)
         if qty < self.min_qty: raise Exception(f"{qty} is to small")
 
-        self.place_market_order_by_base(qty, side)
+        self.place_market_order_by_base(qty, side, curr_price)
 
 
     def cancel_open_order_by_order_link_id(self, order_link_id):
@@ -150,16 +170,17 @@ class FuturesOrders:
         по секции + инструмент
         """
         r = self.cl.cancel_all_orders(category=self.category, symbol=self.symbol)
-        print("* cancel_all_open_orders", r)
+        self.log(r)
 
     def close_position(self):
         """
         Полное закрытие текущей позиции
         """
+        position = self.get_position()
         args = dict(
             category=self.category,
             symbol=self.symbol,
-            side=self.get_position("rev_side"),
+            side=position["rev_side"],
             orderType="Market",
             qty=0.0,
             orderLinkId=f"FireflyX__{self.symbol}_{time.time()}",
@@ -168,15 +189,30 @@ class FuturesOrders:
         )
         self.log("args", args)
 
-        r = self.cl.place_order(**args)
+        with latency.timer("place_order", self.symbol):
+            r = self.cl.place_order(**args)
         self.log("result", r)
+        self._record(r, dict(args, qty=position["qty"]), position["avg_price"])
+
+    def _record(self, r, args, price):
+        """
+        Записываю принятый биржей рыночный ордер в ledger
+        (цена уточнится из position стрима или сверки)
+        """
+        if self.ledger is None or r.get("retCode") != 0:
+            return
+        if price is None:
+            pos = self.ledger.get(self.symbol)
+            price = pos["avg_price"] if pos else 0.0
+        self.ledger.record_order(args["orderLinkId"], self.symbol, args["side"], float(args["qty"]), price)
 
     def log(self, *args):
         """
-        Для удобного вывода из методов класса
+        Для удобного вывода из методов класса:
+        событие orders.<метод> в event_log, без обхода стека
         """
-        caller = inspect.stack()[1].function
-        print(f"* {caller}", self.symbol, "\n\t", args, "\n")
+        if events.info_enabled:
+            events.event(INFO, f"orders.{sys._getframe(1).f_code.co_name}", symbol=self.symbol, args=args)
 
     def _floor(self, value, decimals):
         """
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from event_log import events
+
+
+class PositionLedger:
+    """
+    Local view of the account's open positions.
+
+    Kept up to date from our own order responses (`record_order`), Bybit's
+    private position/execution websocket streams (`subscribe`) and a periodic
+    REST snapshot (`reconcile`), so the trading loop reads positions with a
+    dict lookup instead of `get_positions` round trips.
+    Position messages and REST snapshots are absolute and override the local
+    estimate; own orders and foreign executions are applied as deltas.
+    """
+
+    def __init__(self, cl, category="linear", settle_coin="USDT"):
+        self.cl = cl
+        self.category = category
+        self.settle_coin = settle_coin
+
+        self.positions = {}
+        self._open = set()
+        self._pending = {}
+        # local time of the last own order or position message per symbol
+        self._recorded = {}
+        self._lock = threading.Lock()
+        self.reconciled_at = None
+
+    @property
+    def n_positions(self):
+        return len(self._open)
+
+    def position_value(self, symbol):
+        pos = self.positions.get(symbol)
+        return pos["position_value"] if pos else 0.0
+
+    def get(self, symbol):
+        return self.positions.get(symbol)
+
+    def record_order(self, order_link_id, symbol, side, qty, price):
+        """Own market order accepted by the exchange, applied until the streams confirm it"""
+        with self._lock:
+            now = self._recorded[symbol] = time.time()
+            # quantity still expected from the execution stream, which may fill the order in parts
+            self._pending[order_link_id] = [qty, now]
+            self._apply_fill(symbol, side, qty, price)
+
+    def apply_position(self, row):
+        """Position row from REST `get_positions` or the `position` stream"""
+        symbol = row["symbol"]
+        size = float(row.get("size") or 0)
+        updated = int(row.get("updatedTime") or 0)
+        with self._lock:
+            pos = self.positions.get(symbol)
+            if pos and updated and updated < pos["updated"]:
+                return
+            if size == 0:
+                self.positions.pop(symbol, None)
+                self._open.discard(symbol)
+                return
+            avg_price = float(row.get("avgPrice") or 0)
+            self.positions[symbol] = dict(
+                side=row.get("side"),
+                size=size,
+                avg_price=avg_price,
+                position_value=float(row.get("positionValue") or size * avg_price),
+                unrealised_pnl=float(row.get("unrealisedPnl") or 0),
+                updated=updated,
+            )
+            self._open.add(symbol)
+
+    def on_position_message(self, message):
+        for row in message.get("data", []):
+            if row.get("category", self.category) == self.category:
+                self.apply_position(row)
+                with self._lock:
+                    self._recorded[row["symbol"]] = time.time()
+
+    def on_execution_message(self, message):
+        for row in message.get("data", []):
+            if row.get("category", self.category) != self.category or row.get("execType", "Trade") != "Trade":
+                continue
+            qty = float(row["execQty"])
+            with self._lock:
+                # own orders are already applied in record_order, every partial fill counts down their quantity
+                order_link_id = row.get("orderLinkId")
+                pending = self._pending.get(order_link_id)
+                if pending is not None:
+                    applied = min(qty, pending[0])
+                    pending[0] -= applied
+                    if pending[0] <= 1e-12:
+                        del self._pending[order_link_id]
+                    qty -= applied
+                if qty > 1e-12:
+                    self._apply_fill(row["symbol"], row["side"], qty, float(row["execPrice"]))
+
+    def subscribe(self, ws):
+        """Attaches the ledger to a pybit private WebSocket"""
+        ws.position_stream(callback=self.on_position_message)
+        ws.execution_stream(callback=self.on_execution_message)
+
+    def reconcile(self):
+        """Replaces the local state with a REST snapshot of all open positions"""
+        started = time.time()
+        rows = []
+        cursor = None
+        while True:
+            args = dict(category=self.category, settleCoin=self.settle_coin, limit=200)
+            if cursor:
+                args["cursor"] = cursor
+            r = self.cl.get_positions(**args).get("result", {})
+            rows.extend(r.get("list", []))
+            cursor = r.get("nextPageCursor")
+            if not cursor:
+                break
+
+        with self._lock:
+            # symbols traded or updated by the position stream while the snapshot was taken keep the local state
+            fresh = {s for s, t in self._recorded.items() if t >= started}
+            snapshot = {row["symbol"] for row in rows if float(row.get("size") or 0) > 0}
+            for symbol in list(self._open - snapshot - fresh):
+                self.positions.pop(symbol, None)
+                self._open.discard(symbol)
+            self._pending = {k: p for k, p in self._pending.items() if p[1] > started - 60}
+        for row in rows:
+            if row["symbol"] not in fresh:
+                # rows keep their own updatedTime, so one older than the local state is dropped
+                self.apply_position(row)
+        self.reconciled_at = time.time()
+
+    async def run_reconciliation(self, interval=30):
+        while True:
+            try:
+                await asyncio.to_thread(self.reconcile)
+            except Exception as e:
+                events.error("ledger.reconcile_failed", error=repr(e))
+            await asyncio.sleep(interval)
+
+    def _apply_fill(self, symbol, side, qty, price):
+        pos = self.positions.get(symbol)
+        if pos is None or pos["size"] == 0:
+            self.positions[symbol] = dict(
+                side=side, size=qty, avg_price=price, position_value=qty * price,
+                unrealised_pnl=0.0, updated=pos["updated"] if pos else 0,
+            )
+            self._open.add(symbol)
+            return
+
+        if pos["side"] == side:
+            size = pos["size"] + qty
+            pos["avg_price"] = (pos["avg_price"] * pos["size"] + price * qty) / size
+            pos["size"] = size
+        else:
+            size = pos["size"] - qty
+            if size <= 1e-12:
+                if size < -1e-12:
+                    pos.update(side=side, size=-size, avg_price=price)
+                else:
+                    self.positions.pop(symbol)
+                    self._open.discard(symbol)
+                    return
+            else:
+                pos["size"] = size
+        pos["position_value"] = pos["size"] * pos["avg_price"]
@@ -0,0 +1,340 @@
+"""
+Regression and throughput harness of the pump state machine.
+
+1. Scenarios: every candles JSON in SCENARIOS_DIR is replayed through
+   PumpMonitor and PumpTable and the state after each candle must match
+   the expected sequence in `expected_states.json` (run lengths per file).
+2. A synthetic multi-symbol dataset with injected pumps and dumps
+   (deterministic for a seed) is written as a binary replay file.
+3. Over that dataset: candles/sec, p50/p99 latency and peak Python memory
+   of PumpMonitor (per candle), PumpTable (per minute batch) and the order
+   decision (`strategy.decide`, per candle).
+
+Results, including the state counts on the synthetic data, are written to
+BENCH_RESULTS as sorted JSON; keeping the file under version control makes
+a behaviour change show up as a diff. The previous results are printed
+next to the new ones; timings are only compared (and regressions marked)
+when they were measured on the same machine, state counts always.
+
+    python pump_bench.py [n_symbols] [n_minutes] [--update]
+
+--update rewrites the expected scenario states from the current code.
+"""
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from itertools import groupby
+
+import numpy as np
+
+from pump_monitor import PumpMonitor
+from pump_table import PumpTable
+from replay_file import RECORD_DTYPE, ReplayWriter, read_replay
+from strategy import decide, OPEN, CLOSE
+
+# repository root, so the script finds its data from any working directory
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS_DIR = os.getenv('SCENARIOS_DIR', os.path.join(REPO_DIR, 'candles_data'))
+EXPECTED_STATES = "expected_states.json"
+BENCH_RESULTS = os.getenv('BENCH_RESULTS', os.path.join(REPO_DIR, 'pump_bench.json'))
+# throughput drops beyond this fraction are marked in the comparison
+REGRESSION_TOLERANCE = 0.2
+
+SYNTHETIC_SYMBOLS = 100
+SYNTHETIC_MINUTES = 1440
+SYNTHETIC_SEED = 7
+PUMPS_PER_DAY = 2.0
+DUMPS_PER_DAY = 1.0
+START_TIME = 1_740_000_000_000
+# replay records per read: small, so the loader barely shows in the peak memory
+BENCH_CHUNK = 1024
+
+
+def run_lengths(states):
+    return [[state, len(list(run))] for state, run in groupby(states)]
+
+
+def scenario_states(klines):
+    """States after every candle of a one-symbol scenario: (PumpMonitor, PumpTable)"""
+    symbol = klines[0]["s"]
+    monitor = PumpMonitor(symbol)
+    table = PumpTable([symbol])
+    monitor_states, table_states = [], []
+    for kline in klines:
+        monitor.process_kline(kline)
+        monitor_states.append(monitor.state)
+        table_states.append(table.process_kline(kline))
+    return monitor_states, table_states
+
+
+def check_scenarios(directory=SCENARIOS_DIR, update=False):
+    """
+    Names of the failed scenarios; `update` stores the current states as
+    expected instead. Finding no scenario at all is a failure too.
+    """
+    expected_path = os.path.join(directory, EXPECTED_STATES)
+    expected = {}
+    if os.path.isfile(expected_path):
+        with open(expected_path) as f:
+            expected = json.load(f)
+    failed = []
+    checked = 0
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        name = os.path.basename(path)
+        if name == EXPECTED_STATES:
+            continue
+        with open(path) as f:
+            klines = json.load(f)
+        symbols = {kline["s"] for kline in klines}
+        if len(symbols) != 1:
+            continue
+        monitor_states, table_states = scenario_states(klines)
+        checked += 1
+        if update:
+            expected[name] = run_lengths(monitor_states)
+        for implementation, states in (("PumpMonitor", monitor_states), ("PumpTable", table_states)):
+            ok = expected.get(name) == run_lengths(states)
+            print(f"{'ok  ' if ok else 'FAIL'} {implementation:<12} {name}")
+            if not ok:
+                failed.append(f"{implementation}: {name}")
+                print(f"     expected {expected.get(name)}\n     got      {run_lengths(states)}")
+    if not checked:
+        print(f"FAIL no one-symbol scenarios in {os.path.abspath(directory)}")
+        failed.append(f"no scenarios in {directory}")
+    if update and checked:
+        # one line per scenario, so a changed sequence is a one-line diff
+        lines = (f" {json.dumps(name, ensure_ascii=False)}: {json.dumps(runs)}" for name, runs in sorted(expected.items()))
+        with open(expected_path, "w") as f:
+            f.write("{\n" + ",\n".join(lines) + "\n}\n")
+    return failed
+
+
+def synthetic_records(n_symbols=SYNTHETIC_SYMBOLS, n_minutes=SYNTHETIC_MINUTES, seed=SYNTHETIC_SEED,
+                      pumps_per_day=PUMPS_PER_DAY, dumps_per_day=DUMPS_PER_DAY):
+    """
+    RECORD_DTYPE candles of `n_symbols` random walks, minute by minute.
+    Pumps are a >1% candle followed by a few green ones and a retrace,
+    dumps a few strong red candles.
+    """
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.0015, (n_symbols, n_minutes))
+    days = n_minutes / 1440
+    for symbol in range(n_symbols):
+        for start in rng.integers(0, n_minutes, rng.poisson(pumps_per_day * days)):
+            run = rng.integers(2, 8)
+            moves = np.concatenate([
+                [rng.uniform(0.012, 0.04)], rng.uniform(0.002, 0.012, run),
+                -rng.uniform(0.002, 0.01, rng.integers(3, 15)),
+            ])
+            end = min(n_minutes, start + len(moves))
+            returns[symbol, start:end] = moves[:end - start]
+        for start in rng.integers(0, n_minutes, rng.poisson(dumps_per_day * days)):
+            end = min(n_minutes, start + rng.integers(2, 6))
+            returns[symbol, start:end] = -rng.uniform(0.01, 0.04, end - start)
+
+    close = 100.0 * np.exp(np.cumsum(returns, axis=1))
+    open_ = np.empty_like(close)
+    open_[:, 0] = 100.0
+    open_[:, 1:] = close[:, :-1]
+    wick = np.abs(rng.normal(0, 0.001, (2, n_symbols, n_minutes)))
+
+    records = np.zeros((n_minutes, n_symbols), dtype=RECORD_DTYPE)
+    records["T"] = START_TIME + 60_000 * np.arange(1, n_minutes + 1)[:, None] - 1
+    records["s"] = np.arange(n_symbols)[None, :]
+    records["o"] = open_.T
+    records["c"] = close.T
+    records["h"] = (np.maximum(open_, close) * (1 + wick[0])).T
+    records["l"] = (np.minimum(open_, close) * (1 - wick[1])).T
+    records["v"] = rng.integers(1, 10_000, (n_minutes, n_symbols))
+    return records.reshape(-1)
+
+
+def synthetic_symbols(n_symbols):
+    return [f"syn{n:04d}usdt" for n in range(n_symbols)]
+
+
+def write_synthetic(path, n_symbols=SYNTHETIC_SYMBOLS, n_minutes=SYNTHETIC_MINUTES, seed=SYNTHETIC_SEED):
+    with ReplayWriter(path) as writer:
+        for symbol in synthetic_symbols(n_symbols):
+            writer.symbol_id(symbol)
+        writer.write_records(synthetic_records(n_symbols, n_minutes, seed))
+    return writer.count
+
+
+def bench_monitor(path, symbols, timings):
+    monitors = {s: PumpMonitor(s) for s in symbols}
+    states = Counter()
+    clock = time.perf_counter_ns
+    for n, kline in enumerate(read_replay(path, chunk=BENCH_CHUNK)):
+        monitor = monitors[kline["s"]]
+        started = clock()
+        monitor.process_kline(kline)
+        timings[n] = clock() - started
+        states[monitor.state] += 1
+    return n + 1, states
+
+
+def bench_table(path, symbols, timings):
+    table = PumpTable(symbols)
+    states = Counter()
+    clock = time.perf_counter_ns
+    n = 0
+    for _, batch in groupby(read_replay(path, chunk=BENCH_CHUNK), key=lambda kline: kline["T"]):
+        batch = list(batch)
+        started = clock()
+        batch_states = table.process_klines(batch)
+        timings[n] = clock() - started
+        n += 1
+        states.update(batch_states)
+    return n, states
+
+
+def bench_decide(path, symbols, timings):
+    """strategy.decide on the PumpTable states, with a simple book of open positions"""
+    table = PumpTable(symbols)
+    positions = {}
+    actions = Counter()
+    clock = time.perf_counter_ns
+    n = 0
+    for _, batch in groupby(read_replay(path, chunk=BENCH_CHUNK), key=lambda kline: kline["T"]):
+        batch = list(batch)
+        for kline, state in zip(batch, table.process_klines(batch)):
+            symbol = kline["s"]
+            started = clock()
+            action, quote = decide(state, positions.get(symbol, 0.0), len(positions))
+            timings[n] = clock() - started
+            n += 1
+            if action == OPEN:
+                positions[symbol] = positions.get(symbol, 0.0) + quote
+            elif action == CLOSE:
+                del positions[symbol]
+            actions[action or "hold"] += 1
+    return n, actions
+
+
+STAGES = (
+    ("monitor", bench_monitor, "candle"),
+    ("table", bench_table, "minute batch"),
+    ("decide", bench_decide, "candle"),
+)
+
+
+def run_benchmarks(path, symbols, n_candles):
+    results = {}
+    for name, bench, unit in STAGES:
+        # per call timings (ns) in a preallocated array, the latency histograms start at 1us
+        timings = np.zeros(n_candles, dtype=np.int64)
+        started = time.perf_counter()
+        calls, counts = bench(path, symbols, timings)
+        elapsed = time.perf_counter() - started
+        timings = timings[:calls]
+
+        # second pass for memory: tracemalloc slows the run down too much to time it
+        tracemalloc.start()
+        bench(path, symbols, np.zeros(n_candles, dtype=np.int64))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        p50, p99 = np.percentile(timings, (50, 99)) / 1000
+        results[name] = {
+            "latency_unit": unit,
+            "candles_per_sec": _round(n_candles / (timings.sum() / 1e9)),
+            "wall_candles_per_sec": _round(n_candles / elapsed),
+            "p50_us": _round(p50),
+            "p99_us": _round(p99),
+            "max_us": _round(timings.max() / 1000),
+            "peak_kb": _round(peak / 1024),
+            "counts": dict(sorted(counts.items())),
+        }
+    return results
+
+
+def _round(value, digits=3):
+    """Three significant digits, so run-to-run noise does not flood the diff"""
+    return float(f"{value:.{digits}g}")
+
+
+def machine_info():
+    """What the timings depend on; results of another machine are not compared"""
+    return {
+        "python": platform.python_version(), "numpy": np.__version__, "processor": platform.machine(),
+        "system": platform.system(), "cpu": _cpu_model(), "cpus": os.cpu_count(),
+    }
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def compare(previous, current, timings=True):
+    """Prints the current results next to `previous`; `timings=False` compares only the state counts"""
+    for name, stage in current.items():
+        before = previous.get(name, {})
+        for metric in ("candles_per_sec", "p50_us", "p99_us", "peak_kb"):
+            new, old = stage[metric], before.get(metric)
+            if not old or not timings:
+                print(f"{name:<8} {metric:<16} {new:>12,}")
+                continue
+            change = (new - old) / old
+            worse = -change if metric == "candles_per_sec" else change
+            mark = "  REGRESSION" if worse > REGRESSION_TOLERANCE else ""
+            print(f"{name:<8} {metric:<16} {new:>12,} {old:>12,} {change:+7.1%}{mark}")
+        if before.get("counts") not in (None, stage["counts"]):
+            print(f"{name:<8} state counts changed: {before['counts']} -> {stage['counts']}")
+
+
+def main(n_symbols=SYNTHETIC_SYMBOLS, n_minutes=SYNTHETIC_MINUTES, update=False):
+    failed = check_scenarios(update=update)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.replay")
+        n_candles = write_synthetic(path, n_symbols, n_minutes)
+        print(f"{n_candles} synthetic candles, {n_symbols} symbols x {n_minutes} minutes")
+        stages = run_benchmarks(path, synthetic_symbols(n_symbols), n_candles)
+
+    previous = {}
+    if os.path.isfile(BENCH_RESULTS):
+        with open(BENCH_RESULTS) as f:
+            previous = json.load(f)
+    machine = machine_info()
+    if previous.get("dataset", {}).get("candles") != n_candles:
+        compare({}, stages)
+    elif previous.get("machine") != machine:
+        print(f"previous timings are from another machine ({previous.get('machine')}), comparing state counts only")
+        compare(previous.get("stages", {}), stages, timings=False)
+    else:
+        compare(previous.get("stages", {}), stages)
+
+    results = {
+        "dataset": {"symbols": n_symbols, "minutes": n_minutes, "seed": SYNTHETIC_SEED, "candles": n_candles},
+        "machine": machine,
+        "scenarios_failed": failed,
+        "stages": stages,
+    }
+    with open(BENCH_RESULTS, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+        f.write("\n")
+    return failed
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    failed = main(
+        int(args[0]) if args else SYNTHETIC_SYMBOLS,
+        int(args[1]) if len(args) > 1 else SYNTHETIC_MINUTES,
+        update="--update" in sys.argv,
+    )
+    sys.exit(1 if failed else 0)
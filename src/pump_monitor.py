@@ -1,6 +1,8 @@
 import time
+import numpy as np
 import pandas as pd
-import os
+from event_log import events, DEBUG
+from pump_writer import get_writer
 
 BASE_REMAINING = 120
 START_REMAINING = 2
@@ -19,6 +21,11 @@ tickers_mapping = {
 }
 
 
+def save_pump_data(pump_id, trace):
+    """Hands a finished pump trace to the background writer (see pump_writer)"""
+    get_writer().submit(pump_id, trace)
+
+
 class PumpState:
     BASE = "BASE"
     STARTED = "STARTED"
@@ -28,10 +35,197 @@ class PumpState:
     DUMPED = "DUMPED"
     RETESTED = "RETESTED"
 
+STATE_NAMES = (
+    PumpState.BASE,
+    PumpState.STARTED,
+    PumpState.CONFIRMED,
+    PumpState.COOLING_OFF,
+    PumpState.STABILIZED,
+    PumpState.DUMPED,
+    PumpState.RETESTED,
+)
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+# hard cap of trace rows kept per pump, rows past it are counted in `dropped`
+TRACE_CAPACITY = 5 * BASE_REMAINING
+
+NAT = np.iinfo(np.int64).min
+
+TRACE_COLUMNS = (
+    ('o', np.float64),
+    ('c', np.float64),
+    ('datetime', np.int64),
+    ('start_price', np.float64),
+    ('max_price', np.float64),
+    ('pct_start_to_max', np.float64),
+    ('pct_curr_to_max', np.float64),
+    ('remaining', np.int32),
+    ('state', np.int8),
+    ('pump_id', np.int16),
+)
+
+
+def close_time_ms(value):
+    """Kline close time as epoch ms: ints from the stream, datetime strings from replays"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if value is None or value == '':
+        return NAT
+    if isinstance(value, float):
+        return int(value)
+    try:
+        return int(value)
+    except ValueError:
+        return int(np.datetime64(value, 'ms').astype(np.int64))
+
+
+class PumpTrace:
+    """
+    Columnar trace of the candles of a running pump.
+
+    Columns are typed numpy arrays allocated once per pump with
+    TRACE_CAPACITY rows, states and pump ids are stored as small integer
+    codes. `detach` hands the filled arrays over as a new PumpTrace and
+    starts a fresh buffer, so nothing is copied or allocated per candle and
+    no DataFrame is built on the trading path; the writer thread calls
+    `to_pandas`.
+    """
+
+    def __init__(self, symbol, capacity=TRACE_CAPACITY):
+        self.symbol = symbol
+        self.capacity = capacity
+        self.columns = None
+        self.pump_ids = []
+        self.size = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, pump_id, o, c, close_time, start_price, max_price,
+               pct_start_to_max, pct_curr_to_max, remaining, state):
+        if self.size == self.capacity:
+            self.dropped += 1
+            return
+        if self.columns is None:
+            self.columns = {name: np.empty(self.capacity, dtype=dtype) for name, dtype in TRACE_COLUMNS}
+        if not self.pump_ids or self.pump_ids[-1] != pump_id:
+            self.pump_ids.append(pump_id)
+
+        i = self.size
+        cols = self.columns
+        cols['o'][i] = o
+        cols['c'][i] = c
+        cols['datetime'][i] = close_time_ms(close_time)
+        cols['start_price'][i] = np.nan if start_price is None else start_price
+        cols['max_price'][i] = np.nan if max_price is None else max_price
+        cols['pct_start_to_max'][i] = pct_start_to_max
+        cols['pct_curr_to_max'][i] = pct_curr_to_max
+        cols['remaining'][i] = remaining
+        cols['state'][i] = state if isinstance(state, (int, np.integer)) else STATE_CODES[state]
+        cols['pump_id'][i] = len(self.pump_ids) - 1
+        self.size += 1
+
+    def _views(self):
+        return {name: self.columns[name][:self.size] for name, _ in TRACE_COLUMNS}
+
+    def snapshot(self):
+        """Copy of the filled part of the trace, for checkpoints"""
+        return dict(
+            symbol=self.symbol,
+            capacity=self.capacity,
+            columns={name: view.copy() for name, view in self._views().items()} if self.columns is not None else None,
+            pump_ids=list(self.pump_ids),
+            size=self.size,
+            dropped=self.dropped,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        trace = cls(snapshot['symbol'], snapshot['capacity'])
+        if snapshot['columns'] is not None:
+            trace.columns = {name: np.empty(trace.capacity, dtype=dtype) for name, dtype in TRACE_COLUMNS}
+            for name, values in snapshot['columns'].items():
+                trace.columns[name][:len(values)] = values
+        trace.pump_ids = list(snapshot['pump_ids'])
+        trace.size = snapshot['size']
+        trace.dropped = snapshot['dropped']
+        return trace
+
+    def to_pandas(self):
+        """DataFrame over the buffer arrays, numeric columns are not copied"""
+        views = self._views()
+        n = self.size
+        return pd.DataFrame({
+            'pump_id': pd.Categorical.from_codes(views['pump_id'], categories=self.pump_ids),
+            'symbol': pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[self.symbol]),
+            'o': views['o'],
+            'c': views['c'],
+            'datetime': views['datetime'].view('M8[ms]'),
+            'start_price': views['start_price'],
+            'max_price': views['max_price'],
+            'pct_start_to_max': views['pct_start_to_max'],
+            'pct_curr_to_max': views['pct_curr_to_max'],
+            'remaining': views['remaining'],
+            'state': pd.Categorical.from_codes(views['state'], categories=list(STATE_NAMES)),
+        }, copy=False)
+
+    def to_arrow(self):
+        """pyarrow Table over the buffer arrays, numeric columns are not copied"""
+        import pyarrow as pa
+
+        views = self._views()
+        n = self.size
+        return pa.table({
+            'pump_id': pa.DictionaryArray.from_arrays(views['pump_id'], self.pump_ids),
+            'symbol': pa.DictionaryArray.from_arrays(np.zeros(n, dtype=np.int8), [self.symbol]),
+            'o': views['o'],
+            'c': views['c'],
+            'datetime': pa.array(views['datetime'].view('M8[ms]')),
+            'start_price': views['start_price'],
+            'max_price': views['max_price'],
+            'pct_start_to_max': views['pct_start_to_max'],
+            'pct_curr_to_max': views['pct_curr_to_max'],
+            'remaining': views['remaining'],
+            'state': pa.DictionaryArray.from_arrays(views['state'], list(STATE_NAMES)),
+        })
+
+    def detach(self):
+        """Finished trace as a PumpTrace owning the filled arrays; this buffer starts over with new arrays"""
+        if self.dropped:
+            events.warning("monitor.trace_capped", symbol=self.symbol, capacity=self.capacity, dropped=self.dropped)
+        finished = PumpTrace(self.symbol, self.capacity)
+        finished.columns = self.columns
+        finished.pump_ids = self.pump_ids
+        finished.size = self.size
+        finished.dropped = self.dropped
+        self.columns = None
+        self.pump_ids = []
+        self.size = 0
+        self.dropped = 0
+        return finished
+
+
 class PumpMonitor:
-    def __init__(self, symbol, pump_started_condition=PUPM_STARTED_CONDITION):
+    def __init__(
+        self,
+        symbol,
+        pump_started_condition=PUPM_STARTED_CONDITION,
+        green_count_condition=GREEN_COUNT_CONDITION,
+        pump_cooling_off_condition=PUMP_COOLING_OFF_CONDITION,
+        pump_stabilized_condition=PUMP_STABILIZED_CONDITION,
+        pump_dumped_condition=PUMP_DUMPED_CONDITION,
+        base_remaining=BASE_REMAINING,
+        start_remaining=START_REMAINING,
+    ):
         self.symbol = symbol.lower()
         self.pump_started_condition = pump_started_condition
+        self.green_count_condition = green_count_condition
+        self.pump_cooling_off_condition = pump_cooling_off_condition
+        self.pump_stabilized_condition = pump_stabilized_condition
+        self.pump_dumped_condition = pump_dumped_condition
+        self.base_remaining = base_remaining
+        self.start_remaining = start_remaining
         
         self.remaining = 0
         self.start_price = None
@@ -39,31 +233,32 @@ class PumpMonitor:
         self.state = PumpState.BASE
         self.green_count = 0
         
-        self.data_rows = []
+        self.trace = PumpTrace(self.symbol)
 
     def print_state(self, kline):
         self.remaining -= 1
-        print('-'*100)
-        print(self.pump_id )
-        print(
-            f"{self.symbol}: o={kline.get('o')}, c={kline.get('c')}, {kline.get('datetime', '')} | "
-            f"start={self.start_price}, max={self.max_price}, +{self.pct_start_to_max}%, {self.pct_curr_to_max}% from max | remaining={self.remaining}"
+        if events.debug_enabled:
+            events.event(
+                DEBUG, "monitor.state",
+                symbol=self.symbol, pump_id=self.pump_id,
+                o=kline.get('o'), c=kline.get('c'), datetime=kline.get('datetime', kline.get('T', '')),
+                start=self.start_price, max=self.max_price,
+                pct_start_to_max=self.pct_start_to_max, pct_curr_to_max=self.pct_curr_to_max,
+                remaining=self.remaining, state=self.state,
+            )
+
+        self.trace.append(
+            self.pump_id,
+            float(kline.get('o')),
+            float(kline.get('c')),
+            kline.get('T'),
+            self.start_price,
+            self.max_price,
+            self.pct_start_to_max,
+            self.pct_curr_to_max,
+            self.remaining,
+            self.state,
         )
-        print(f"[{self.symbol}] Current state: {self.state}")
-        
-        self.data_rows.append({
-            'pump_id': self.pump_id,
-            'symbol': self.symbol,
-            'o': kline.get('o'),
-            'c': kline.get('c'),
-            'datetime': kline.get('T', ''),
-            'start_price': self.start_price,
-            'max_price': self.max_price,
-            'pct_start_to_max': self.pct_start_to_max,
-            'pct_curr_to_max': self.pct_curr_to_max,
-            'remaining': self.remaining,
-            'state': self.state
-        })
 
     def process_kline(self, kline):
         current = float(kline["c"])
@@ -71,7 +266,7 @@ class PumpMonitor:
 
         if self.state == PumpState.BASE:
             if (current - o) / o > self.pump_started_condition:
-                self.remaining = START_REMAINING
+                self.remaining = self.start_remaining
                 self.start_price = o
                 self.max_price = current
                 self.state = PumpState.STARTED
@@ -82,7 +277,7 @@ class PumpMonitor:
                     time_id = str(time.time())
 
                 self.pump_id = f"{self.symbol}_{time_id}"
-                print(f"Pump started on symbol: {self.symbol}")
+                events.info("monitor.started", symbol=self.symbol, pump_id=self.pump_id)
             else:
                 if self.remaining > 0:
                     self.print_state(kline)
@@ -96,51 +291,46 @@ class PumpMonitor:
         if self.state == PumpState.STARTED:
             if candle_is_green:
                 self.green_count += 1
-                if self.green_count >= GREEN_COUNT_CONDITION:
+                if self.green_count >= self.green_count_condition:
                     self.state = PumpState.CONFIRMED
-                    self.remaining = BASE_REMAINING
-                    print(f"Pump confirmed: {self.symbol}")
+                    self.remaining = self.base_remaining
+                    events.info("monitor.confirmed", symbol=self.symbol, pump_id=self.pump_id)
             else:
-                print(f"DEBUG: not green candle, pump not confirmed, go to BASE")
+                events.debug("monitor.not_confirmed", symbol=self.symbol, pump_id=self.pump_id)
                 self.start_price = None
                 self.max_price = None
                 self.state = PumpState.BASE
                 self.green_count = 0
 
         elif self.state == PumpState.CONFIRMED:
-            if self.pct_start_to_max * PUMP_COOLING_OFF_CONDITION <= abs(self.pct_curr_to_max):
+            if self.pct_start_to_max * self.pump_cooling_off_condition <= abs(self.pct_curr_to_max):
                 self.state = PumpState.COOLING_OFF
-                self.remaining = BASE_REMAINING
-                print(f"Pump is cooling off: {self.symbol}")
+                self.remaining = self.base_remaining
+                events.info("monitor.cooling_off", symbol=self.symbol, pump_id=self.pump_id)
 
         elif self.state == PumpState.COOLING_OFF:
-            if self.pct_start_to_max * PUMP_STABILIZED_CONDITION <= abs(self.pct_curr_to_max):
+            if self.pct_start_to_max * self.pump_stabilized_condition <= abs(self.pct_curr_to_max):
                 self.state = PumpState.STABILIZED
-                self.remaining = BASE_REMAINING
-                print(f"Price rolled back by a quarter of the growth: {self.symbol}")
+                self.remaining = self.base_remaining
+                events.info("monitor.stabilized", symbol=self.symbol, pump_id=self.pump_id)
 
         elif self.state == PumpState.STABILIZED:
             if current >= self.max_price:
                 self.state = PumpState.RETESTED
-                self.remaining = BASE_REMAINING
-                print(f"Price reached the pump peak: {self.symbol}")
-            elif self.pct_start_to_max * PUMP_DUMPED_CONDITION <= abs(self.pct_curr_to_max):
+                self.remaining = self.base_remaining
+                events.info("monitor.retested", symbol=self.symbol, pump_id=self.pump_id)
+            elif self.pct_start_to_max * self.pump_dumped_condition <= abs(self.pct_curr_to_max):
                 self.state = PumpState.DUMPED
-                self.remaining = BASE_REMAINING
-                print(f"Price rolled back by more than half of the growth: {self.symbol}")
+                self.remaining = self.base_remaining
+                events.info("monitor.dumped", symbol=self.symbol, pump_id=self.pump_id)
                 
         elif self.state == PumpState.DUMPED:
             self.state = PumpState.BASE
 
 
         if self.remaining == 0:
-            if self.data_rows:
-                df = pd.DataFrame(self.data_rows)
-                os.makedirs('/home/koshkidadanet/My Files/FireflyX/pump_data', exist_ok=True)
-                parquet_path = f"/home/koshkidadanet/My Files/FireflyX/pump_data/{self.pump_id}.parquet"
-                df.to_parquet(parquet_path)
-                print(f"Saved pump data to {parquet_path}")
-                self.data_rows = []
+            if self.trace:
+                save_pump_data(self.pump_id, self.trace.detach())
             
             self.state = PumpState.BASE
             self.start_price = None
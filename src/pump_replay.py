@@ -0,0 +1,199 @@
+import numpy as np
+
+from pump_monitor import (
+    BASE_REMAINING,
+    START_REMAINING,
+    PUPM_STARTED_CONDITION,
+    GREEN_COUNT_CONDITION,
+    PUMP_STABILIZED_CONDITION,
+    PUMP_COOLING_OFF_CONDITION,
+    PUMP_DUMPED_CONDITION,
+    STATE_NAMES,
+)
+
+BASE, STARTED, CONFIRMED, COOLING_OFF, STABILIZED, DUMPED, RETESTED = range(len(STATE_NAMES))
+
+TRANSITION_DTYPE = np.dtype([
+    ("index", np.int64),
+    ("prev", np.int8),
+    ("state", np.int8),
+])
+
+SEGMENT_DTYPE = np.dtype([
+    ("start", np.int64),
+    ("end", np.int64),
+    ("start_time", np.int64),
+    ("start_price", np.float64),
+    ("max_price", np.float64),
+    ("peak_state", np.int8),
+    ("exit_state", np.int8),
+])
+
+
+def replay_symbol(
+    o,
+    c,
+    close_time=None,
+    pump_started_condition=PUPM_STARTED_CONDITION,
+    green_count_condition=GREEN_COUNT_CONDITION,
+    pump_cooling_off_condition=PUMP_COOLING_OFF_CONDITION,
+    pump_stabilized_condition=PUMP_STABILIZED_CONDITION,
+    pump_dumped_condition=PUMP_DUMPED_CONDITION,
+    base_remaining=BASE_REMAINING,
+    start_remaining=START_REMAINING,
+):
+    """
+    Batch replay of the PumpMonitor state machine over one symbol's candles.
+
+    Runs the same transitions as `PumpMonitor.process_kline` fed with the
+    candles one by one, but without the per-candle dicts, prints and trace
+    rows. Idle BASE candles are skipped in bulk: the start condition is
+    evaluated vectorized and the loop only walks candles inside pumps.
+
+    Returns `(transitions, segments)`:
+    - transitions: TRANSITION_DTYPE array, one row per candle after which
+      the monitor state differs from the state before it;
+    - segments: SEGMENT_DTYPE array, one row per pump from the STARTED candle
+      to the candle where the state falls back to BASE (`end == -1` if the
+      pump is still running at the end of the data).
+    States are coded as indexes into `STATE_NAMES`.
+    """
+    o = np.asarray(o, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    n = len(o)
+    if close_time is None:
+        times = None
+    else:
+        times = np.asarray(close_time, dtype=np.int64).tolist()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        triggers = np.flatnonzero((c - o) / o > pump_started_condition).tolist()
+    opens = o.tolist()
+    closes = c.tolist()
+
+    transitions = []
+    segments = []
+
+    state = BASE
+    remaining = 0
+    start_price = None
+    max_price = None
+    green_count = 0
+    seg_start = seg_time = -1
+    seg_start_price = seg_max_price = 0.0
+    peak_state = BASE
+
+    k = 0
+    n_triggers = len(triggers)
+    i = 0
+    while i < n:
+        prev = state
+        if state == BASE:
+            # Idle BASE candles only count `remaining` down, jump to the next start.
+            while k < n_triggers and triggers[k] < i:
+                k += 1
+            if k == n_triggers:
+                break
+            j = triggers[k]
+            remaining = max(0, remaining - (j - i))
+            i = j
+
+            remaining = start_remaining
+            start_price = opens[i]
+            max_price = closes[i]
+            state = STARTED
+            green_count = 0
+
+            seg_start = i
+            seg_time = times[i] if times is not None else -1
+            seg_start_price = start_price
+            peak_state = STARTED
+
+        current = closes[i]
+        max_price = max(current, max_price)
+        pct_start_to_max = (max_price - start_price) / start_price * 100
+        pct_curr_to_max = (current - max_price) / max_price * 100
+        seg_max_price = max_price
+
+        if state == STARTED:
+            if current > opens[i]:
+                green_count += 1
+                if green_count >= green_count_condition:
+                    state = CONFIRMED
+                    remaining = base_remaining
+            else:
+                start_price = None
+                max_price = None
+                state = BASE
+                green_count = 0
+
+        elif state == CONFIRMED:
+            if pct_start_to_max * pump_cooling_off_condition <= abs(pct_curr_to_max):
+                state = COOLING_OFF
+                remaining = base_remaining
+
+        elif state == COOLING_OFF:
+            if pct_start_to_max * pump_stabilized_condition <= abs(pct_curr_to_max):
+                state = STABILIZED
+                remaining = base_remaining
+
+        elif state == STABILIZED:
+            if current >= max_price:
+                state = RETESTED
+                remaining = base_remaining
+            elif pct_start_to_max * pump_dumped_condition <= abs(pct_curr_to_max):
+                state = DUMPED
+                remaining = base_remaining
+
+        elif state == DUMPED:
+            state = BASE
+
+        if remaining == 0:
+            state = BASE
+            start_price = None
+            max_price = None
+            green_count = 0
+        else:
+            remaining -= 1
+
+        if state != prev:
+            transitions.append((i, prev, state))
+            if state == BASE:
+                segments.append((seg_start, i, seg_time, seg_start_price, seg_max_price, peak_state, prev))
+            elif state > peak_state:
+                peak_state = state
+        elif state == BASE:
+            # started and reset within the same candle
+            segments.append((seg_start, i, seg_time, seg_start_price, seg_max_price, peak_state, STARTED))
+        i += 1
+
+    if state != BASE:
+        segments.append((seg_start, -1, seg_time, seg_start_price, seg_max_price, peak_state, state))
+
+    return (
+        np.array(transitions, dtype=TRANSITION_DTYPE),
+        np.array(segments, dtype=SEGMENT_DTYPE),
+    )
+
+
+def replay(candles, **params):
+    """
+    Batch replay for several symbols.
+    candles: {symbol: (o, c)} or {symbol: (o, c, close_time)}
+    Returns {symbol: (transitions, segments)}, params as in `replay_symbol`.
+    """
+    return {
+        symbol: replay_symbol(*arrays, **params)
+        for symbol, arrays in candles.items()
+    }
+
+
+def expand_states(transitions, n):
+    """
+    Per-candle state codes (state after each candle) from a transitions array
+    """
+    states = np.zeros(n, dtype=np.int8)
+    if len(transitions):
+        bounds = np.append(transitions["index"], n)
+        states[bounds[0]:] = np.repeat(transitions["state"], np.diff(bounds))
+    return states
@@ -0,0 +1,169 @@
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore, MINUTE_MS
+from pump_monitor import STATE_NAMES
+from pump_replay import replay_symbol, expand_states, BASE
+from strategy import decide, OPEN, CLOSE, BASE_POSITION
+
+TAKER_FEE = 0.00055
+
+DEFAULT_GRID = {
+    "pump_started_condition": [0.0075, 0.01, 0.015, 0.02],
+    "green_count_condition": [2, 3, 4],
+    "pump_cooling_off_condition": [0.1, 0.2],
+    "pump_stabilized_condition": [0.25, 0.35],
+    "pump_dumped_condition": [0.55, 0.7],
+}
+
+
+def load_candles(path):
+    """
+    Historical 1m candles from the CCXT parquet (`03_05_1m.parquet` layout:
+    ticker, datetime, open, close, ...) or a CandleStore directory
+    as {symbol: (o, c, close_time_ms)}
+    """
+    store = CandleStore(path)
+    if os.path.isdir(path) and store.tickers():
+        # memory-mapped, nothing is read before the replay touches it
+        return {
+            ticker.lower(): (candles.open, candles.close, candles.time + MINUTE_MS - 1)
+            for ticker, candles in ((t, store.series(t)) for t in store.tickers())
+        }
+    df = pd.read_parquet(path, columns=["ticker", "datetime", "open", "close"])
+    df = df.sort_values(["ticker", "datetime"])
+    candles = {}
+    for ticker, g in df.groupby("ticker", sort=False):
+        symbol = ticker.replace("/", "").lower()
+        close_time = g["datetime"].to_numpy("datetime64[ms]").astype(np.int64) + MINUTE_MS - 1
+        candles[symbol] = (g["open"].to_numpy(np.float64), g["close"].to_numpy(np.float64), close_time)
+    return candles
+
+
+def grid_combinations(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def simulate_symbol(o, c, close_time, states, base_position=BASE_POSITION, fee=TAKER_FEE):
+    """
+    Replays the `strategy.decide` rules over per-candle states of one symbol,
+    filling market orders at the candle close.
+    Returns a list of closed trades (exit_time, pnl) and the unrealised pnl at the end.
+    MAX_POSITIONS is not applied: every symbol is traded on its own.
+    """
+    trades = []
+    qty = cost = pnl = 0.0
+    for i in np.flatnonzero(states != BASE).tolist():
+        price = c[i]
+        action, quote = decide(STATE_NAMES[states[i]], qty * price, 0, base_position=base_position)
+        if action == OPEN:
+            q = quote / price
+            qty += q
+            cost += quote
+            pnl -= quote * fee
+        elif action == CLOSE:
+            value = qty * price
+            pnl += value - cost - value * fee
+            trades.append((close_time[i], pnl))
+            qty = cost = pnl = 0.0
+    unrealised = qty * c[-1] - cost + pnl if qty else 0.0
+    return trades, unrealised
+
+
+def evaluate(candles, params, base_position=BASE_POSITION, fee=TAKER_FEE):
+    """PnL, hit rate and drawdown of one parameter combination over all symbols"""
+    trades = []
+    unrealised = 0.0
+    n_pumps = 0
+    for o, c, close_time in candles.values():
+        transitions, segments = replay_symbol(o, c, **params)
+        n_pumps += len(segments)
+        states = expand_states(transitions, len(o))
+        symbol_trades, symbol_unrealised = simulate_symbol(o, c, close_time, states, base_position, fee)
+        trades.extend(symbol_trades)
+        unrealised += symbol_unrealised
+
+    trades.sort()
+    pnls = np.array([pnl for _, pnl in trades], dtype=np.float64)
+    equity = np.cumsum(pnls)
+    drawdown = float(np.max(np.maximum.accumulate(np.r_[0.0, equity]) - np.r_[0.0, equity])) if len(pnls) else 0.0
+    return dict(
+        params,
+        pnl=float(pnls.sum() + unrealised),
+        realised_pnl=float(pnls.sum()),
+        trades=len(pnls),
+        hit_rate=float((pnls > 0).mean()) if len(pnls) else 0.0,
+        max_drawdown=drawdown,
+        pumps=n_pumps,
+    )
+
+
+# Candles shared with the workers: one shared memory block with all
+# (o, c, close_time) columns, every worker maps it once in `_attach`.
+_shm = None
+_candles = None
+
+
+def _share(candles):
+    layout = []
+    total = 0
+    for symbol, (o, c, _) in candles.items():
+        layout.append((symbol, total, len(o)))
+        total += len(o)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total * 3 * 8))
+    block = np.ndarray((3, total), dtype=np.float64, buffer=shm.buf)
+    for (symbol, start, n), (o, c, close_time) in zip(layout, candles.values()):
+        block[0, start:start + n] = o
+        block[1, start:start + n] = c
+        block[2, start:start + n].view(np.int64)[:] = close_time
+    return shm, layout
+
+
+def _attach(name, layout):
+    global _shm, _candles
+    _shm = shared_memory.SharedMemory(name=name)
+    block = np.ndarray((3, sum(n for _, _, n in layout)), dtype=np.float64, buffer=_shm.buf)
+    block.flags.writeable = False
+    _candles = {
+        symbol: (block[0, start:start + n], block[1, start:start + n], block[2, start:start + n].view(np.int64))
+        for symbol, start, n in layout
+    }
+
+
+def _evaluate_shared(args):
+    params, base_position, fee = args
+    return evaluate(_candles, params, base_position, fee)
+
+
+def run_sweep(candles, grid=DEFAULT_GRID, max_workers=None, base_position=BASE_POSITION, fee=TAKER_FEE):
+    """
+    Evaluates every combination of `grid` ({replay_symbol param: [values]})
+    over `candles` ({symbol: (o, c, close_time)}) in a process pool.
+    Returns the results table ranked by pnl.
+    """
+    combinations = grid_combinations(grid)
+    shm, layout = _share(candles)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(shm.name, layout)) as pool:
+            tasks = [(params, base_position, fee) for params in combinations]
+            results = list(pool.map(_evaluate_shared, tasks, chunksize=max(1, len(tasks) // (4 * (max_workers or os.cpu_count() or 1)))))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    df = pd.DataFrame(results)
+    return df.sort_values(["pnl", "max_drawdown"], ascending=[False, True]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "03_05_1m.parquet"
+    results = run_sweep(load_candles(path))
+    results.to_csv("sweep_results.csv", index=False)
+    print(results.head(20).to_string())
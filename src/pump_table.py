@@ -0,0 +1,279 @@
+import time
+import numpy as np
+
+from event_log import events
+from pump_monitor import (
+    BASE_REMAINING,
+    START_REMAINING,
+    PUPM_STARTED_CONDITION,
+    GREEN_COUNT_CONDITION,
+    PUMP_STABILIZED_CONDITION,
+    PUMP_COOLING_OFF_CONDITION,
+    PUMP_DUMPED_CONDITION,
+    STATE_NAMES,
+    NAT,
+    PumpTrace,
+    close_time_ms,
+    save_pump_data,
+)
+from pump_replay import BASE, STARTED, CONFIRMED, COOLING_OFF, STABILIZED, DUMPED, RETESTED
+
+
+# per-symbol arrays saved in snapshots
+TABLE_ARRAYS = (
+    'state', 'remaining', 'start_price', 'max_price', 'green_count',
+    'pct_start_to_max', 'pct_curr_to_max', 'last_close', 'early',
+)
+
+
+class PumpTable:
+    """
+    PumpMonitor state for many symbols kept as one array slot per symbol.
+
+    `update` advances every symbol of a batch (e.g. all candles closed in the
+    same minute) in one vectorized step with the same transitions as
+    `PumpMonitor.process_kline`. Work per step depends on the batch size and
+    the number of running pumps only, not on the number of watched symbols.
+    """
+
+    def __init__(
+        self,
+        symbols,
+        pump_started_condition=PUPM_STARTED_CONDITION,
+        green_count_condition=GREEN_COUNT_CONDITION,
+        pump_cooling_off_condition=PUMP_COOLING_OFF_CONDITION,
+        pump_stabilized_condition=PUMP_STABILIZED_CONDITION,
+        pump_dumped_condition=PUMP_DUMPED_CONDITION,
+        base_remaining=BASE_REMAINING,
+        start_remaining=START_REMAINING,
+        timeframe="1m",
+    ):
+        self.symbols = [s.lower() for s in symbols]
+        # candles the table runs on (candle_aggregator), part of the pump ids of other timeframes
+        self.timeframe = timeframe
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.pump_started_condition = pump_started_condition
+        self.green_count_condition = green_count_condition
+        self.pump_cooling_off_condition = pump_cooling_off_condition
+        self.pump_stabilized_condition = pump_stabilized_condition
+        self.pump_dumped_condition = pump_dumped_condition
+        self.base_remaining = base_remaining
+        self.start_remaining = start_remaining
+
+        n = len(self.symbols)
+        self.state = np.full(n, BASE, dtype=np.int8)
+        self.remaining = np.zeros(n, dtype=np.int32)
+        self.start_price = np.full(n, np.nan)
+        self.max_price = np.full(n, np.nan)
+        self.green_count = np.zeros(n, dtype=np.int32)
+        self.pct_start_to_max = np.zeros(n)
+        self.pct_curr_to_max = np.zeros(n)
+        self.pump_id = [None] * n
+        # close time (epoch ms) of the last candle seen per symbol
+        self.last_close = np.full(n, NAT, dtype=np.int64)
+        # STARTED inside a still open candle, see start_early
+        self.early = np.zeros(n, dtype=bool)
+
+        # traces of running pumps only: {slot: PumpTrace}
+        self.traces = {}
+
+    def state_of(self, symbol):
+        return STATE_NAMES[self.state[self.index[symbol.lower()]]]
+
+    def snapshot(self):
+        """
+        Copy of the whole table state (per-symbol arrays, pump ids and the
+        traces of running pumps), cheap enough to take between candles
+        """
+        snapshot = {name: getattr(self, name).copy() for name in TABLE_ARRAYS}
+        snapshot['symbols'] = list(self.symbols)
+        snapshot['pump_id'] = list(self.pump_id)
+        snapshot['traces'] = {self.symbols[slot]: trace.snapshot() for slot, trace in self.traces.items()}
+        return snapshot
+
+    def restore(self, snapshot):
+        """
+        Loads a `snapshot` into the matching symbols of this table (symbols
+        added or removed since are left as they are). Returns the number of
+        restored symbols.
+        """
+        slots = [(self.index[s], i) for i, s in enumerate(snapshot['symbols']) if s in self.index]
+        if not slots:
+            return 0
+        dst, src = (np.array(x, dtype=np.intp) for x in zip(*slots))
+        for name in TABLE_ARRAYS:
+            if name in snapshot:
+                getattr(self, name)[dst] = snapshot[name][src]
+        for d, i in slots:
+            self.pump_id[d] = snapshot['pump_id'][i]
+        self.traces = {
+            self.index[s]: PumpTrace.from_snapshot(t) for s, t in snapshot['traces'].items() if s in self.index
+        }
+        return len(slots)
+
+    def start_early(self, symbol, close_time):
+        """
+        Moves a BASE symbol to STARTED inside its still open candle (intra-candle
+        detection from the trade stream). When the candle closes it is processed
+        as the trigger candle whatever its close, so every later transition runs
+        on closed candles exactly as before. Returns False if the symbol is not in BASE.
+        close_time: close time (ms) of the open candle, gives the same pump id as a closed-candle start
+        """
+        slot = self.index[symbol]
+        if self.state[slot] != BASE:
+            return False
+        self.state[slot] = STARTED
+        self.early[slot] = True
+        self.pump_id[slot] = self._pump_id(slot, close_time)
+        events.info(
+            "monitor.transition", symbol=symbol, timeframe=self.timeframe, pump_id=self.pump_id[slot],
+            prev="BASE", state="STARTED", early=True,
+        )
+        return True
+
+    def _pump_id(self, slot, time_id):
+        if self.timeframe == "1m":
+            return f"{self.symbols[slot]}_{time_id}"
+        return f"{self.symbols[slot]}_{self.timeframe}_{time_id}"
+
+    def last_closes(self):
+        """{symbol: close time ms} of the symbols that have seen a candle"""
+        return {s: int(t) for s, t in zip(self.symbols, self.last_close) if t != NAT}
+
+    def process_kline(self, kline):
+        return self.process_klines([kline])[0]
+
+    def process_klines(self, klines):
+        """
+        Batch of klines in the `process_kline` dict format, one per symbol.
+        Returns the new state names in the same order.
+        """
+        idx = np.fromiter((self.index[k["s"].lower()] for k in klines), dtype=np.intp, count=len(klines))
+        o = np.fromiter((float(k["o"]) for k in klines), dtype=np.float64, count=len(klines))
+        c = np.fromiter((float(k["c"]) for k in klines), dtype=np.float64, count=len(klines))
+        close_time = [k.get("T") for k in klines]
+        return [STATE_NAMES[s] for s in self.update(idx, o, c, close_time)]
+
+    def update(self, idx, o, c, close_time=None):
+        """
+        One vectorized step for symbol slots `idx` (unique) with candle
+        open/close arrays. Returns the new state codes of those slots.
+        """
+        if close_time is not None:
+            self.last_close[idx] = [close_time_ms(t) for t in close_time]
+        st = self.state[idx]
+        prev = st.copy()
+        early = self.early[idx]
+        if early.any():
+            st[early] = BASE
+            self.early[idx] = False
+        rem = self.remaining[idx]
+        sp = self.start_price[idx]
+        mp = self.max_price[idx]
+        gc = self.green_count[idx]
+        pct_s = self.pct_start_to_max[idx]
+        pct_c = self.pct_curr_to_max[idx]
+
+        base = st == BASE
+        with np.errstate(divide="ignore", invalid="ignore"):
+            trig = base & (((c - o) / o > self.pump_started_condition) | early)
+        active = ~base | trig
+
+        rem[trig] = self.start_remaining
+        sp[trig] = o[trig]
+        mp[trig] = c[trig]
+        st[trig] = STARTED
+        gc[trig] = 0
+        for j in np.flatnonzero(trig):
+            slot = idx[j]
+            time_id = close_time[j] if close_time is not None else None
+            if time_id is None:
+                time_id = time.time()
+            self.pump_id[slot] = self._pump_id(slot, time_id)
+
+        mp[active] = np.maximum(c[active], mp[active])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct_s[active] = ((mp - sp) / sp * 100)[active]
+            pct_c[active] = ((c - mp) / mp * 100)[active]
+        green = c > o
+        abs_c = np.abs(pct_c)
+
+        chain = st.copy()
+        m = active & (chain == STARTED)
+        g = m & green
+        gc[g] += 1
+        confirmed = g & (gc >= self.green_count_condition)
+        st[confirmed] = CONFIRMED
+        rem[confirmed] = self.base_remaining
+        red = m & ~green
+        sp[red] = np.nan
+        mp[red] = np.nan
+        st[red] = BASE
+        gc[red] = 0
+
+        m = active & (chain == CONFIRMED) & (pct_s * self.pump_cooling_off_condition <= abs_c)
+        st[m] = COOLING_OFF
+        rem[m] = self.base_remaining
+
+        m = active & (chain == COOLING_OFF) & (pct_s * self.pump_stabilized_condition <= abs_c)
+        st[m] = STABILIZED
+        rem[m] = self.base_remaining
+
+        m = active & (chain == STABILIZED)
+        retested = m & (c >= mp)
+        dumped = m & ~retested & (pct_s * self.pump_dumped_condition <= abs_c)
+        st[retested] = RETESTED
+        st[dumped] = DUMPED
+        rem[retested | dumped] = self.base_remaining
+
+        st[active & (chain == DUMPED)] = BASE
+
+        finished = active & (rem == 0)
+        st[finished] = BASE
+        sp[finished] = np.nan
+        mp[finished] = np.nan
+        gc[finished] = 0
+        traced = rem > 0
+        rem[traced] -= 1
+
+        self.state[idx] = st
+        self.remaining[idx] = rem
+        self.start_price[idx] = sp
+        self.max_price[idx] = mp
+        self.green_count[idx] = gc
+        self.pct_start_to_max[idx] = pct_s
+        self.pct_curr_to_max[idx] = pct_c
+
+        for j in np.flatnonzero(finished):
+            slot = idx[j]
+            trace = self.traces.pop(slot, None)
+            if trace:
+                save_pump_data(self.pump_id[slot], trace.detach())
+
+        for j in np.flatnonzero(traced):
+            slot = idx[j]
+            trace = self.traces.get(slot)
+            if trace is None:
+                trace = self.traces[slot] = PumpTrace(self.symbols[slot])
+            trace.append(
+                self.pump_id[slot],
+                o[j],
+                c[j],
+                close_time[j] if close_time is not None else None,
+                sp[j],
+                mp[j],
+                pct_s[j],
+                pct_c[j],
+                rem[j],
+                st[j],
+            )
+
+        if events.info_enabled:
+            for j in np.flatnonzero(st != prev):
+                slot = idx[j]
+                events.info(
+                    "monitor.transition", symbol=self.symbols[slot], timeframe=self.timeframe, pump_id=self.pump_id[slot],
+                    prev=STATE_NAMES[prev[j]], state=STATE_NAMES[st[j]],
+                )
+
+        return st
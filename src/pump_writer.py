@@ -0,0 +1,140 @@
+import atexit
+import os
+import pickle
+import queue
+import threading
+import time
+import pandas as pd
+from event_log import events
+
+PUMP_DATA_DIR = os.getenv('PUMP_DATA_DIR', 'pump_data')
+# batches that could not be written to the dataset are pickled here instead of being lost
+PUMP_SPILL_DIR = os.getenv('PUMP_SPILL_DIR', 'pump_data_failed')
+
+FLOAT_COLUMNS = ['o', 'c', 'start_price', 'max_price', 'pct_start_to_max', 'pct_curr_to_max']
+
+_STOP = object()
+
+
+class PumpDataWriter:
+    """
+    Background writer for finished pump records.
+
+    Records go through a bounded queue to a worker thread that groups them
+    and appends them to one parquet dataset partitioned by symbol/date under
+    `root`. `submit` blocks while the queue is full (backpressure), `close`
+    flushes everything still queued. A batch that fails to write is pickled
+    to `spill_dir` (`load_spill` reads it back for `submit`), and `close`
+    raises once everything else is written if any batch failed.
+    """
+
+    def __init__(self, root=PUMP_DATA_DIR, max_queue=1000, batch_size=64, flush_interval=5.0,
+                 spill_dir=PUMP_SPILL_DIR):
+        self.root = root
+        self.spill_dir = spill_dir
+        self.failures = []
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="pump-data-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, pump_id, rows):
+        self.queue.put((pump_id, rows))
+
+    def close(self, timeout=None):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+        if self.failures:
+            raise RuntimeError(
+                f"{len(self.failures)} pump batches were not written to {self.root}: "
+                + "; ".join(f"{error} -> {spill or 'lost'}" for error, spill in self.failures)
+            )
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                batch.append(item)
+            if batch and (item is None or item is _STOP or len(batch) >= self.batch_size):
+                self._write(batch)
+                batch = []
+            if item is None or not batch:
+                deadline = time.monotonic() + self.flush_interval
+            if item is _STOP:
+                return
+
+    def _write(self, batch):
+        try:
+            df = pd.concat([
+                _frame(rows) for _, rows in batch
+            ], ignore_index=True)
+            for col in ['pump_id', 'symbol', 'state']:
+                df[col] = df[col].astype(str)
+            for col in FLOAT_COLUMNS:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+            df['datetime'] = _close_times(df['datetime'])
+            df['date'] = df['datetime'].dt.strftime('%Y-%m-%d').fillna(time.strftime('%Y-%m-%d'))
+
+            df.to_parquet(self.root, partition_cols=['symbol', 'date'], index=False)
+            events.info("writer.saved", pumps=len(batch), rows=len(df), root=self.root)
+        except Exception as e:
+            spill = self._spill(batch)
+            self.failures.append((repr(e), spill))
+            events.error("writer.failed", pumps=len(batch), error=repr(e), spilled_to=spill)
+
+    def _spill(self, batch):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"pumps-{time.time_ns()}.pkl")
+            with open(path, "wb") as f:
+                pickle.dump(batch, f)
+            return path
+        except Exception as e:
+            events.error("writer.spill_failed", pumps=len(batch), error=repr(e))
+            return None
+
+
+def load_spill(path):
+    """[(pump_id, rows), ...] of a spilled batch, e.g. to `submit` again"""
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _frame(rows):
+    """DataFrame of submitted rows: a PumpTrace (built here, off the trading path), a DataFrame or records"""
+    if isinstance(rows, pd.DataFrame):
+        return rows
+    if hasattr(rows, 'to_pandas'):
+        return rows.to_pandas()
+    return pd.DataFrame(rows)
+
+
+def _close_times(close_time):
+    """
+    Kline close times as datetimes: already converted (PumpTrace),
+    epoch ms (live stream) or datetime strings (replayed candles)
+    """
+    if pd.api.types.is_datetime64_any_dtype(close_time):
+        return close_time
+    ms = pd.to_numeric(close_time, errors='coerce')
+    dt = pd.to_datetime(ms, unit='ms', errors='coerce')
+    return dt.fillna(pd.to_datetime(close_time.where(ms.isna()), errors='coerce', format='mixed'))
+
+
+_writer = None
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        _writer = PumpDataWriter()
+        atexit.register(_writer.close)
+    return _writer
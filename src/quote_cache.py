@@ -0,0 +1,57 @@
+import os
+import time
+
+# quotes older than this (seconds) are treated as missing; Bybit re-sends an
+# unchanged depth-1 book about every 3 s, so a quiet but live symbol stays fresh
+QUOTE_MAX_AGE = float(os.getenv('QUOTE_MAX_AGE', '5.0'))
+
+
+class QuoteCache:
+    """
+    Best bid/ask per symbol from a streaming top-of-book subscription,
+    with the local receive time of every update for staleness checks.
+    """
+
+    def __init__(self, max_age=QUOTE_MAX_AGE):
+        self.max_age = max_age
+        self.quotes = {}
+
+    def update(self, symbol, bid, ask, received=None):
+        prev = self.quotes.get(symbol)
+        if prev:
+            bid = prev[0] if bid is None else bid
+            ask = prev[1] if ask is None else ask
+        self.quotes[symbol] = (bid, ask, time.time() if received is None else received)
+
+    def get(self, symbol, max_age=None):
+        """(bid, ask) if the quote is fresh, otherwise None"""
+        quote = self.quotes.get(symbol)
+        if quote is None:
+            return None
+        bid, ask, received = quote
+        if time.time() - received > (self.max_age if max_age is None else max_age):
+            return None
+        return bid, ask
+
+    def ask(self, symbol, max_age=None):
+        quote = self.get(symbol, max_age)
+        return quote[1] if quote and quote[1] is not None else None
+
+    def bid(self, symbol, max_age=None):
+        quote = self.get(symbol, max_age)
+        return quote[0] if quote and quote[0] is not None else None
+
+    def on_orderbook_message(self, message):
+        """Callback for pybit `orderbook_stream(depth=1, ...)`"""
+        data = message.get("data", {})
+        bids = data.get("b")
+        asks = data.get("a")
+        self.update(
+            data["s"],
+            float(bids[0][0]) if bids else None,
+            float(asks[0][0]) if asks else None,
+        )
+
+    def subscribe(self, ws, symbols):
+        """Top-of-book subscription for `symbols` on a pybit linear public WebSocket"""
+        ws.orderbook_stream(depth=1, symbol=list(symbols), callback=self.on_orderbook_message)
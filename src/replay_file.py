@@ -0,0 +1,163 @@
+import json
+import struct
+import sys
+
+import numpy as np
+import pandas as pd
+
+from pump_monitor import close_time_ms
+
+# header: magic, record count, offset of the symbol table (written last, after the records)
+REPLAY_MAGIC = b"FFXREPL1"
+HEADER = struct.Struct("<8sQQ")
+RECORD_DTYPE = np.dtype([
+    ("T", "<i8"),
+    ("s", "<u4"),
+    ("o", "<f8"),
+    ("h", "<f8"),
+    ("l", "<f8"),
+    ("c", "<f8"),
+    ("v", "<f8"),
+])
+# records read or buffered at a time
+REPLAY_CHUNK = 65_536
+MINUTE_MS = 60_000
+
+
+class ReplayWriter:
+    """
+    Writes klines to a binary replay file: fixed-width records (close time
+    ms, symbol id, o, h, l, c, v) after a small header, then the symbol
+    dictionary. Records are buffered `chunk` at a time, so any number of
+    klines can be written in constant memory. h/l default to the candle
+    body and v to 0 when the kline has none.
+    """
+
+    def __init__(self, path, chunk=REPLAY_CHUNK):
+        self.path = path
+        self.symbols = {}
+        self.count = 0
+        self._buffer = np.zeros(chunk, dtype=RECORD_DTYPE)
+        self._n = 0
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(REPLAY_MAGIC, 0, 0))
+
+    def symbol_id(self, symbol):
+        symbol_id = self.symbols.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.symbols[symbol] = len(self.symbols)
+        return symbol_id
+
+    def write(self, kline):
+        o = float(kline["o"])
+        c = float(kline["c"])
+        self._buffer[self._n] = (
+            close_time_ms(kline["T"] if "T" in kline else kline.get("datetime")), self.symbol_id(kline["s"]), o,
+            float(kline["h"]) if "h" in kline else max(o, c),
+            float(kline["l"]) if "l" in kline else min(o, c),
+            c, float(kline.get("v") or 0.0),
+        )
+        self._n += 1
+        if self._n == len(self._buffer):
+            self._flush()
+
+    def write_records(self, records):
+        """Appends a RECORD_DTYPE array whose symbol ids come from `symbol_id`"""
+        self._flush()
+        self._file.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+        self.count += len(records)
+
+    def close(self):
+        self._flush()
+        table = json.dumps(list(self.symbols)).encode()
+        offset = self._file.tell()
+        self._file.write(table)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(REPLAY_MAGIC, self.count, offset))
+        self._file.close()
+
+    def _flush(self):
+        if self._n:
+            self._file.write(self._buffer[:self._n].tobytes())
+            self.count += self._n
+            self._n = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_replay_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(REPLAY_MAGIC)) == REPLAY_MAGIC
+
+
+def read_header(f):
+    magic, count, offset = HEADER.unpack(f.read(HEADER.size))
+    if magic != REPLAY_MAGIC:
+        raise ValueError(f"{getattr(f, 'name', f)} is not a replay file")
+    f.seek(offset)
+    symbols = json.loads(f.read())
+    f.seek(HEADER.size)
+    return count, symbols
+
+
+def read_chunks(path, start=0, chunk=REPLAY_CHUNK):
+    """(symbols, structured array of up to `chunk` records) from record `start` on"""
+    with open(path, "rb") as f:
+        count, symbols = read_header(f)
+        start = min(start, count)
+        f.seek(HEADER.size + start * RECORD_DTYPE.itemsize)
+        remaining = count - start
+        while remaining:
+            records = np.fromfile(f, dtype=RECORD_DTYPE, count=min(chunk, remaining))
+            if not len(records):
+                raise ValueError(f"{path} is truncated: {remaining} records missing")
+            remaining -= len(records)
+            yield symbols, records
+
+
+def read_replay(path, start=0, chunk=REPLAY_CHUNK):
+    """
+    Streams the klines of a replay file as dicts (s, o, h, l, c, v, T)
+    from record `start` on; only `chunk` records are in memory at a time
+    """
+    for symbols, records in read_chunks(path, start, chunk):
+        for T, s, o, h, l, c, v in zip(*(records[name].tolist() for name in RECORD_DTYPE.names)):
+            yield {"s": symbols[s], "o": o, "h": h, "l": l, "c": c, "v": v, "T": T}
+
+
+def convert(source, path):
+    """
+    Replay file from a candles JSON (list of kline dicts with "T" or
+    "datetime") or a parquet in the `03_05_1m.parquet` layout (ticker,
+    datetime, open, high, low, close, volume); returns the number of records
+    """
+    if source.endswith(".json"):
+        with open(source) as f:
+            klines = json.load(f)
+        with ReplayWriter(path) as writer:
+            for kline in klines:
+                writer.write(kline)
+        return writer.count
+
+    df = pd.read_parquet(source, columns=["ticker", "datetime", "open", "high", "low", "close", "volume"])
+    df = df.sort_values(["datetime", "ticker"], kind="stable")
+    close_time = df["datetime"].to_numpy("datetime64[ms]").astype(np.int64) + MINUTE_MS - 1
+    ticker = df["ticker"].astype(str).str.replace("/", "").str.lower().to_numpy()
+    with ReplayWriter(path) as writer:
+        records = np.zeros(len(df), dtype=RECORD_DTYPE)
+        records["T"] = close_time
+        records["s"] = [writer.symbol_id(symbol) for symbol in ticker]
+        for name, column in zip("ohlcv", ("open", "high", "low", "close", "volume")):
+            records[name] = df[column].to_numpy(np.float64)
+        writer.write_records(records)
+    return writer.count
+
+
+if __name__ == "__main__":
+    # python replay_file.py allusdt.json allusdt.replay
+    n = convert(sys.argv[1], sys.argv[2])
+    print(f"{n} records written to {sys.argv[2]}")
@@ -0,0 +1,203 @@
+import itertools
+import time
+
+TAKER_FEE = 0.00055
+MAKER_FEE = 0.0002
+
+DEFAULT_INSTRUMENT = {
+    "priceScale": "4",
+    "lotSizeFilter": {"minOrderQty": "0.001", "qtyStep": "0.001"},
+}
+
+
+def _ok(result):
+    return {"retCode": 0, "retMsg": "OK", "result": result, "time": int(time.time() * 1000)}
+
+
+class SimulatedHTTP:
+    """
+    In-process stand-in for `pybit.unified_trading.HTTP` (linear, one-way mode).
+
+    Implements the calls FuturesOrders and the trading loop use, with pybit's
+    response layout (numbers as strings). Prices are not fetched: the replay
+    sets them per candle with `set_price`. Market orders fill at that price
+    with the taker fee, limit orders fill once the price crosses them.
+    """
+
+    def __init__(self, instruments=None, taker_fee=TAKER_FEE, maker_fee=MAKER_FEE):
+        self.instruments = dict(instruments or {})
+        self.taker_fee = taker_fee
+        self.maker_fee = maker_fee
+
+        self.prices = {}
+        self.positions = {}
+        self.open_orders = {}
+        self._order_ids = itertools.count(1)
+
+        self.realised_pnl = 0.0
+        self.fees = 0.0
+        self.n_fills = 0
+        self.closed_trades = []
+
+    def set_price(self, symbol, price):
+        self.prices[symbol] = price
+        if self.open_orders:
+            self._match_limit_orders(symbol, price)
+
+    def get_instruments_info(self, category="linear", symbol=None, limit=None, cursor=None, **kwargs):
+        symbols = [symbol] if symbol else sorted(self.instruments)
+        return _ok({
+            "category": category,
+            "list": [self._instrument(s) for s in symbols],
+            "nextPageCursor": "",
+        })
+
+    def get_tickers(self, category="linear", symbol=None, **kwargs):
+        symbols = [symbol] if symbol else sorted(self.prices)
+        return _ok({
+            "category": category,
+            "list": [
+                {
+                    "symbol": s,
+                    "lastPrice": str(self.prices[s]),
+                    "bid1Price": str(self.prices[s]),
+                    "ask1Price": str(self.prices[s]),
+                    "markPrice": str(self.prices[s]),
+                }
+                for s in symbols
+            ],
+        })
+
+    def get_positions(self, category="linear", symbol=None, settleCoin=None, **kwargs):
+        if symbol:
+            rows = [self._position(symbol)]
+        else:
+            rows = [self._position(s) for s, p in self.positions.items() if p["size"] > 0]
+        return _ok({"category": category, "list": rows, "nextPageCursor": ""})
+
+    def place_order(self, category="linear", symbol=None, side=None, orderType="Market", qty="0",
+                    price=None, orderLinkId=None, reduceOnly=False, closeOnTrigger=False, **kwargs):
+        order_id = str(next(self._order_ids))
+        qty = float(qty)
+        if reduceOnly:
+            pos = self.positions.get(symbol)
+            held = pos["size"] if pos and pos["side"] != side else 0.0
+            qty = held if qty == 0 else min(qty, held)
+
+        if orderType == "Market":
+            if symbol not in self.prices:
+                return {"retCode": 10001, "retMsg": f"no price for {symbol}", "result": {}}
+            if qty > 0:
+                self._fill(symbol, side, qty, self.prices[symbol], self.taker_fee)
+        else:
+            self.open_orders[order_id] = dict(
+                orderId=order_id, orderLinkId=orderLinkId, symbol=symbol, side=side,
+                qty=qty, price=float(price), reduceOnly=reduceOnly,
+            )
+            if symbol in self.prices:
+                self._match_limit_orders(symbol, self.prices[symbol])
+
+        return _ok({"orderId": order_id, "orderLinkId": orderLinkId or ""})
+
+    def cancel_order(self, category="linear", symbol=None, orderId=None, orderLinkId=None, **kwargs):
+        for oid, order in list(self.open_orders.items()):
+            if oid == orderId or (orderLinkId and order["orderLinkId"] == orderLinkId):
+                del self.open_orders[oid]
+                return _ok({"orderId": oid, "orderLinkId": order["orderLinkId"] or ""})
+        return {"retCode": 110001, "retMsg": "order not exists or too late to cancel", "result": {}}
+
+    def cancel_all_orders(self, category="linear", symbol=None, **kwargs):
+        cancelled = [
+            self.open_orders.pop(oid) for oid, order in list(self.open_orders.items())
+            if symbol is None or order["symbol"] == symbol
+        ]
+        return _ok({"list": [{"orderId": o["orderId"], "orderLinkId": o["orderLinkId"] or ""} for o in cancelled]})
+
+    def summary(self):
+        unrealised = sum(self._unrealised(s) for s in self.positions)
+        wins = sum(1 for pnl in self.closed_trades if pnl > 0)
+        return dict(
+            realised_pnl=self.realised_pnl,
+            unrealised_pnl=unrealised,
+            fees=self.fees,
+            fills=self.n_fills,
+            trades=len(self.closed_trades),
+            hit_rate=wins / len(self.closed_trades) if self.closed_trades else 0.0,
+        )
+
+    def _instrument(self, symbol):
+        info = dict(DEFAULT_INSTRUMENT, **self.instruments.get(symbol, {}))
+        info.update(symbol=symbol, status="Trading", settleCoin="USDT", quoteCoin="USDT")
+        return info
+
+    def _unrealised(self, symbol):
+        pos = self.positions.get(symbol)
+        if not pos or pos["size"] == 0 or symbol not in self.prices:
+            return 0.0
+        direction = 1 if pos["side"] == "Buy" else -1
+        return (self.prices[symbol] - pos["avg_price"]) * pos["size"] * direction
+
+    def _position(self, symbol):
+        pos = self.positions.get(symbol)
+        if not pos or pos["size"] == 0:
+            return {
+                "symbol": symbol, "side": "", "size": "0", "avgPrice": "0",
+                "positionValue": "", "unrealisedPnl": "", "cumRealisedPnl": "0",
+                "markPrice": str(self.prices.get(symbol, "")),
+            }
+        return {
+            "symbol": symbol,
+            "side": pos["side"],
+            "size": str(pos["size"]),
+            "avgPrice": str(pos["avg_price"]),
+            "positionValue": str(pos["size"] * pos["avg_price"]),
+            "unrealisedPnl": str(self._unrealised(symbol)),
+            "cumRealisedPnl": str(pos["cum_realised"]),
+            "markPrice": str(self.prices.get(symbol, "")),
+        }
+
+    def _fill(self, symbol, side, qty, price, fee_rate):
+        pos = self.positions.setdefault(symbol, dict(side="", size=0.0, avg_price=0.0, cum_realised=0.0, trade_pnl=0.0))
+        fee = qty * price * fee_rate
+        self.fees += fee
+        self.realised_pnl -= fee
+        pos["cum_realised"] -= fee
+        pos["trade_pnl"] -= fee
+        self.n_fills += 1
+
+        if pos["size"] == 0 or pos["side"] == side:
+            new_size = pos["size"] + qty
+            pos["avg_price"] = (pos["avg_price"] * pos["size"] + price * qty) / new_size
+            pos["size"] = new_size
+            pos["side"] = side
+            return
+
+        closed = min(qty, pos["size"])
+        direction = 1 if pos["side"] == "Buy" else -1
+        pnl = (price - pos["avg_price"]) * closed * direction
+        self.realised_pnl += pnl
+        pos["cum_realised"] += pnl
+        pos["trade_pnl"] += pnl
+        pos["size"] -= closed
+
+        if pos["size"] <= 1e-12:
+            self.closed_trades.append(pos["trade_pnl"])
+            pos.update(side="", size=0.0, avg_price=0.0, trade_pnl=0.0)
+            rest = qty - closed
+            if rest > 1e-12:
+                pos.update(side=side, size=rest, avg_price=price)
+
+    def _match_limit_orders(self, symbol, price):
+        for oid, order in list(self.open_orders.items()):
+            if order["symbol"] != symbol:
+                continue
+            buy_hit = order["side"] == "Buy" and price <= order["price"]
+            sell_hit = order["side"] == "Sell" and price >= order["price"]
+            if buy_hit or sell_hit:
+                del self.open_orders[oid]
+                qty = order["qty"]
+                if order["reduceOnly"]:
+                    pos = self.positions.get(symbol)
+                    qty = min(qty, pos["size"] if pos and pos["side"] != order["side"] else 0.0)
+                if qty > 0:
+                    self._fill(symbol, order["side"], qty, order["price"], self.maker_fee)
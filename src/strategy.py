@@ -0,0 +1,31 @@
+from pump_monitor import PumpState
+
+BASE_POSITION = 1000
+MAX_POSITIONS = 3
+
+CLOSE_STATES = (PumpState.COOLING_OFF, PumpState.DUMPED, PumpState.RETESTED)
+
+OPEN = "open"
+CLOSE = "close"
+
+
+def decide(state, pos_value, n_positions, base_position=BASE_POSITION, max_positions=MAX_POSITIONS):
+    """
+    Trading decision for a symbol after its candle was processed.
+    :param state: PumpState of the symbol
+    :param pos_value: current position value of the symbol in USDT
+    :param n_positions: number of open positions over all symbols
+    :return: (CLOSE, 0), (OPEN, quote amount to buy) or (None, 0)
+    """
+    if state in CLOSE_STATES and pos_value > 0:
+        return CLOSE, 0
+
+    if n_positions < max_positions or pos_value > 0:
+        if state == PumpState.STARTED and pos_value < base_position/2 * 0.9:
+            return OPEN, base_position/2
+        elif state == PumpState.CONFIRMED and pos_value < base_position * 0.9:
+            return OPEN, base_position/2
+        elif state == PumpState.STABILIZED and pos_value < base_position * 0.9:
+            return OPEN, base_position
+
+    return None, 0
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from event_log import events
+from notify_dispatcher import NotificationDispatcher, PRIORITY_INFO, forbidden
+from order_gateway import TokenBucket
+
+SUBSCRIBERS_DB = os.getenv('SUBSCRIBERS_DB', 'subscribers.sqlite3')
+# the bot process writes the registry, the engine re-reads the active chats this often (seconds)
+SUBSCRIBERS_REFRESH = 10.0
+# Telegram allows about 30 messages per second over all chats of a bot
+GLOBAL_RATE = 25
+FANOUT_QUEUE_SIZE = 10_000
+# queue depth and delivery counters go to the event log this often (seconds), 0 disables it
+NOTIFY_STATS_INTERVAL = float(os.getenv('NOTIFY_STATS_INTERVAL', '60'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    chat_id INTEGER PRIMARY KEY,
+    active INTEGER NOT NULL DEFAULT 1,
+    position_size REAL,
+    max_positions INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+SETTINGS = ("position_size", "max_positions")
+
+
+class SubscriberRegistry:
+    """
+    Persistent chats subscribed to trade notifications, with their settings
+    (position size, max positions), in a local sqlite file shared by the bot
+    process (writes) and the engine (reads). The set of active chats is
+    cached in memory and reloaded every `refresh` seconds.
+    """
+
+    def __init__(self, path=SUBSCRIBERS_DB, refresh=SUBSCRIBERS_REFRESH):
+        self.path = path
+        self.refresh = refresh
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(SCHEMA)
+        self._lock = threading.Lock()
+        self._active = None
+        self._loaded = 0.0
+
+    def subscribe(self, chat_id):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO subscribers (chat_id, active, created_at, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET active=1, updated_at=excluded.updated_at",
+                (chat_id, now, now),
+            )
+            if self._active is not None:
+                self._active.add(chat_id)
+
+    def unsubscribe(self, chat_id):
+        with self._lock:
+            self._db.execute("UPDATE subscribers SET active=0, updated_at=? WHERE chat_id=?", (time.time(), chat_id))
+            if self._active is not None:
+                self._active.discard(chat_id)
+
+    def ensure(self, chat_id):
+        """Subscribes a chat unless it is already known (keeps an unsubscribe)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO subscribers (chat_id, active, created_at, updated_at) VALUES (?, 1, ?, ?)",
+                (chat_id, now, now),
+            )
+            self._active = None
+
+    def update_settings(self, chat_id, **settings):
+        """update_settings(chat_id, position_size=500) - subscribes the chat if needed"""
+        unknown = set(settings) - set(SETTINGS)
+        if unknown:
+            raise ValueError(f"unknown settings: {sorted(unknown)}")
+        self.subscribe(chat_id)
+        if not settings:
+            return
+        columns = ", ".join(f"{name}=?" for name in settings)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE subscribers SET {columns}, updated_at=? WHERE chat_id=?",
+                (*settings.values(), time.time(), chat_id),
+            )
+
+    def get(self, chat_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT chat_id, active, position_size, max_positions FROM subscribers WHERE chat_id=?", (chat_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(chat_id=row[0], active=bool(row[1]), position_size=row[2], max_positions=row[3])
+
+    def active_chats(self):
+        """Cached set of active chat ids"""
+        if self._active is None or time.monotonic() - self._loaded > self.refresh:
+            with self._lock:
+                rows = self._db.execute("SELECT chat_id FROM subscribers WHERE active=1").fetchall()
+                self._active = {row[0] for row in rows}
+                self._loaded = time.monotonic()
+        return self._active
+
+    def close(self):
+        self._db.close()
+
+
+class FanOut:
+    """
+    Delivers every notification to all active subscribers.
+
+    `publish` only appends the event to a queue, O(1) for the trading loop
+    whatever the number of subscribers. A background task expands each event
+    to the per-chat NotificationDispatchers (per-chat rate limit, priorities,
+    digests), which all share one global TokenBucket for the bot-wide limit.
+    Chats that blocked the bot are unsubscribed.
+    """
+
+    def __init__(self, bot, registry, global_rate=GLOBAL_RATE, queue_size=FANOUT_QUEUE_SIZE,
+                 stats_interval=NOTIFY_STATS_INTERVAL, **dispatcher_args):
+        self.bot = bot
+        self.registry = registry
+        self.global_limiter = TokenBucket(global_rate)
+        self.dispatcher_args = dispatcher_args
+        self.dispatchers = {}
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.published = 0
+        self.stats_interval = stats_interval
+        self._task = None
+        self._reporter = None
+
+    def publish(self, text, priority=PRIORITY_INFO):
+        try:
+            self.queue.put_nowait((text, priority))
+            self.published += 1
+        except asyncio.QueueFull:
+            events.error("fanout.queue_full", size=self.queue.qsize())
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            if self.stats_interval:
+                self._reporter = asyncio.create_task(self._report())
+        return self._task
+
+    def stats(self):
+        total = dict(published=self.published, queued=self.queue.qsize(), chats=len(self.dispatchers), pending=0)
+        for dispatcher in self.dispatchers.values():
+            total["pending"] += dispatcher.pending()
+            for name, value in dispatcher.stats.items():
+                total[name] = total.get(name, 0) + value
+        return total
+
+    async def close(self, drain=True, timeout=30.0):
+        if drain:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                events.warning("fanout.drain_timeout", queued=self.queue.qsize())
+        for task in (self._task, self._reporter):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._reporter = None
+        await asyncio.gather(*(d.close(drain, timeout) for d in self.dispatchers.values()))
+
+    def _dispatcher(self, chat_id):
+        dispatcher = self.dispatchers.get(chat_id)
+        if dispatcher is None:
+            dispatcher = self.dispatchers[chat_id] = NotificationDispatcher(
+                self.bot, chat_id, global_limiter=self.global_limiter, on_drop=self._on_drop,
+                **self.dispatcher_args,
+            )
+            dispatcher.start()
+        return dispatcher
+
+    def _on_drop(self, chat_id, error):
+        if forbidden(error):
+            self.registry.unsubscribe(chat_id)
+            events.info("fanout.unsubscribed", chat_id=chat_id, error=repr(error))
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            events.info("notify.stats", **self.stats())
+
+    async def _run(self):
+        while True:
+            text, priority = await self.queue.get()
+            try:
+                for n, chat_id in enumerate(list(self.registry.active_chats())):
+                    self._dispatcher(chat_id).submit(text, priority)
+                    if n % 500 == 499:
+                        await asyncio.sleep(0)
+            finally:
+                self.queue.task_done()
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from event_log import events
+from kline_decode import decode_trade
+from kline_ingest import BINANCE_WS_URL, STREAMS_PER_CONNECTION, stream_forever
+from latency import latency
+
+
+class IntraCandleDetector:
+    """
+    Running open/high/last of the current minute per symbol, fed by the
+    aggregated trade stream. As soon as the last price of the minute is
+    more than `pump_started_condition` above its open, the symbol is moved
+    to STARTED in the PumpTable (`start_early`) instead of waiting for the
+    candle to close. Per trade this is a dict lookup and a few comparisons;
+    the threshold is only evaluated on a new high of the minute.
+    """
+
+    def __init__(self, table, interval_ms=60_000):
+        self.table = table
+        self.threshold = table.pump_started_condition
+        self.interval_ms = interval_ms
+        self.names = {s.upper(): s for s in table.symbols}
+        # {SYMBOL: [open_time, open, high, last, done]}
+        self.bars = {}
+
+    def on_trade(self, symbol, price, trade_time):
+        """Returns the monitor symbol whose pump started on this trade, otherwise None"""
+        open_time = trade_time - trade_time % self.interval_ms
+        bar = self.bars.get(symbol)
+        if bar is None or bar[0] != open_time:
+            # the first minute after (re)connecting is partial, its open is not the candle's
+            self.bars[symbol] = [open_time, price, price, price, bar is None]
+            return None
+        bar[3] = price
+        if price <= bar[2]:
+            return None
+        bar[2] = price
+        if bar[4] or (price - bar[1]) / bar[1] <= self.threshold:
+            return None
+        bar[4] = True
+        name = self.names.get(symbol)
+        if name is not None and self.table.start_early(name, open_time + self.interval_ms - 1):
+            return name
+        return None
+
+    def reset(self, symbols):
+        """Forgets the running minutes of `symbols`, e.g. after their stream reconnected"""
+        for symbol in symbols:
+            self.bars.pop(symbol.upper(), None)
+
+
+class TradeStream:
+    """
+    Binance aggTrade streams of the detector's symbols, sharded over
+    several connections like KlineIngest. `on_start(symbol, trade_time)`
+    is called on the event loop for every intra-candle pump start.
+    """
+
+    def __init__(self, detector, on_start, per_connection=STREAMS_PER_CONNECTION):
+        self.detector = detector
+        self.on_start = on_start
+        symbols = list(detector.names.values())
+        self.shards = [symbols[i:i + per_connection] for i in range(0, len(symbols), per_connection)]
+        self.trades = 0
+        self._tasks = []
+
+    def url(self, shard):
+        return BINANCE_WS_URL + "/".join(f"{s}@aggTrade" for s in shard)
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._run_shard(n, shard)) for n, shard in enumerate(self.shards)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_shard(self, n, shard):
+        async def on_reconnect():
+            self.detector.reset(shard)
+        await stream_forever(self.url(shard), self._on_message, f"trade/{n}", on_reconnect)
+
+    async def _on_message(self, msg):
+        self.trades += 1
+        symbol, price, trade_time = decode_trade(msg)
+        name = self.detector.on_trade(symbol, price, trade_time)
+        if name is not None:
+            latency.observe("trade_to_start", symbol, time.time() - trade_time / 1000)
+            try:
+                self.on_start(name, trade_time)
+            except Exception as e:
+                events.error("trades.on_start_failed", symbol=name, error=repr(e))
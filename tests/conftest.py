@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# modules live flat in src/ and are imported by name, as the scripts there do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# keep the event log and pump traces of the tests out of the working directory
+_tmp = tempfile.mkdtemp(prefix="fireflyx-tests-")
+os.environ.setdefault("EVENT_LOG_PATH", os.path.join(_tmp, "events.jsonl"))
+os.environ.setdefault("PUMP_DATA_DIR", os.path.join(_tmp, "pump_data"))
+os.environ.setdefault("PUMP_SPILL_DIR", os.path.join(_tmp, "pump_data_failed"))
+# retries are expected in the tests, only errors are echoed
+os.environ.setdefault("EVENT_LOG_ECHO_LEVEL", "ERROR")
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from candle_store import CandleStore, MINUTE_MS, to_ms
+
+START = 1_740_000_000_000
+
+
+@pytest.mark.parametrize("value", [START, float(START), np.int64(START), np.float64(START),
+                                   "2025-02-19 21:20:00", np.datetime64(START, "ms")])
+def test_to_ms(value):
+    assert to_ms(value) == START
+
+
+def test_query_with_float_bounds(tmp_path):
+    store = CandleStore(str(tmp_path))
+    times = START + MINUTE_MS * np.arange(10)
+    store.append("SOL/USDT", times, *[np.arange(10.0)] * 5)
+    candles = store.query("SOL/USDT", float(times[2]), float(times[5]))
+    assert candles.time.tolist() == times[2:6].tolist()
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+from fake_bot import FakeBot, FakeRetryAfter
+from notify_dispatcher import NotificationDispatcher, PRIORITY_CLOSE, PRIORITY_OPEN, PRIORITY_INFO
+from subscribers import FanOut, SubscriberRegistry
+
+CHAT_ID = 1
+
+
+class RecordingBot(FakeBot):
+    """FakeBot that also remembers when every send attempt was rejected"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejections = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        try:
+            return await super().send_message(chat_id, text, **kwargs)
+        except FakeRetryAfter:
+            self.rejections.append(time.time())
+            raise
+
+
+async def run(bot, submit, **dispatcher_args):
+    dispatcher = NotificationDispatcher(bot, CHAT_ID, **dispatcher_args)
+    submit(dispatcher)
+    dispatcher.start()
+    await dispatcher.close(drain=True, timeout=30.0)
+    return dispatcher
+
+
+def test_closes_go_before_opens_and_opens_before_info():
+    bot = FakeBot(chat_rate=100, chat_burst=100)
+
+    def submit(dispatcher):
+        dispatcher.submit("info", PRIORITY_INFO)
+        dispatcher.submit("open 1", PRIORITY_OPEN)
+        dispatcher.submit("close 1", PRIORITY_CLOSE)
+        dispatcher.submit("open 2", PRIORITY_OPEN)
+        dispatcher.submit("close 2", PRIORITY_CLOSE)
+
+    asyncio.run(run(bot, submit, rate=100, burst=100, window=0, max_digest=1))
+    assert bot.messages() == ["close 1", "close 2", "open 1", "open 2", "info"]
+
+
+def test_burst_within_one_window_is_one_digest():
+    bot = FakeBot()
+
+    def submit(dispatcher):
+        for n in range(5):
+            dispatcher.submit(f"open {n}", PRIORITY_OPEN)
+        dispatcher.submit("close", PRIORITY_CLOSE)
+
+    dispatcher = asyncio.run(run(bot, submit, window=0.1))
+    sent = bot.messages()
+    assert len(sent) == 1
+    assert dispatcher.stats["digests"] == 1 and dispatcher.stats["messages"] == 6
+    assert sent[0].startswith("close")
+
+
+def test_sends_stay_within_the_token_bucket_after_flood_control(rate=20.0, burst=2, retry_after=0.2, n=30):
+    # the bot accepts half the dispatcher's rate, so flood control kicks in
+    bot = RecordingBot(chat_rate=rate / 2, chat_burst=1, retry_after=retry_after)
+
+    def submit(dispatcher):
+        for i in range(n):
+            dispatcher.submit(f"message {i}", PRIORITY_OPEN)
+
+    dispatcher = asyncio.run(run(bot, submit, rate=rate, burst=burst, window=0, max_digest=1, max_retries=50))
+    stats = dispatcher.stats
+    assert bot.rejected > 0 and stats["retries"] == bot.rejected
+    assert bot.messages() == [f"message {i}" for i in range(n)] and stats["dropped"] == 0
+
+    times = [sent for sent, _, _ in bot.sent]
+    # every stretch of sends fits the bucket: at most burst + rate * elapsed messages (+ timer slack)
+    for i in range(len(times)):
+        for j in range(i + 1, len(times)):
+            assert j - i + 1 <= burst + rate * (times[j] - times[i]) + 1
+    # nothing is sent to the chat until retry_after has passed since a rejection
+    for rejected in bot.rejections:
+        assert not any(rejected < sent < rejected + retry_after * 0.95 for sent in times)
+
+
+def test_blocked_chat_is_unsubscribed(tmp_path, blocked=2):
+    bot = FakeBot(chat_rate=100, chat_burst=100, blocked=[blocked])
+    registry = SubscriberRegistry(str(tmp_path / "subscribers.sqlite3"))
+    registry.subscribe(1)
+    registry.subscribe(blocked)
+
+    async def fan_out():
+        fanout = FanOut(bot, registry, stats_interval=0, window=0, max_digest=1)
+        fanout.start()
+        fanout.publish("hello", PRIORITY_OPEN)
+        await fanout.close(drain=True, timeout=10.0)
+
+    asyncio.run(fan_out())
+    try:
+        assert [chat for _, chat, _ in bot.sent] == [1]
+        assert list(registry.active_chats()) == [1]
+    finally:
+        registry.close()
@@ -0,0 +1,140 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+
+from fake_exchange import FakeExchange
+from ohlcv_download import OHLCVDownloader, last_timestamp, partition_symbol, read_candles
+
+MINUTE_MS = 60_000
+START = int(pd.Timestamp("2025-02-26").value // 1_000_000)
+# 4 days and a half-open minute: the data spans February and March
+NOW = START + 4 * 86_400_000 + 30_000
+TICKERS = ["SOL/USDT", "DOGE/USDT", "BTC/USDT"]
+GAP = (START + 3_600_000, START + 5 * 3_600_000)
+REFRESH_NOW = NOW + 86_400_000
+NEW_SINCE = NOW - 3_600_000
+
+
+class RecordingExchange(FakeExchange):
+    """FakeExchange that remembers the `since` of every request per symbol"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.since = {}
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=1000):
+        self.since.setdefault(symbol, []).append(since)
+        return await super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+
+def expected_times(ticker, start, now):
+    """Open times of the closed candles the fake serves for `ticker`"""
+    times = pd.RangeIndex(start + (-start) % MINUTE_MS, now - now % MINUTE_MS, MINUTE_MS)
+    if ticker == "BTC/USDT":
+        times = times[(times < GAP[0]) | (times > GAP[1])]
+    return list(times)
+
+
+def stored_times(root, ticker):
+    df = read_candles(root, [ticker])
+    return list(df["datetime"].to_numpy("datetime64[ms]").astype("int64"))
+
+
+def files(root):
+    """{path: (size, mtime)} of every stored partition file"""
+    found = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            found[path] = (os.path.getsize(path), os.stat(path).st_mtime_ns)
+    return found
+
+
+@pytest.fixture(scope="module")
+def first(tmp_path_factory):
+    """First download, with requests three times faster than the exchange accepts"""
+    root = str(tmp_path_factory.mktemp("ohlcv") / "candles_1m")
+    exchange = RecordingExchange(TICKERS + ["NEW/USDT"], START, NOW, rateLimit=20, fail_every=7,
+                                 gaps={"BTC/USDT": [GAP]})
+    downloader = OHLCVDownloader(exchange, root, flush_rows=2000, retry_delay=0.01)
+    exchange.rateLimit = 60
+    asyncio.run(downloader.download(TICKERS, START))
+    return root, exchange, downloader
+
+
+@pytest.fixture(scope="module")
+def refresh(first):
+    """A day later: refresh of the stored tickers plus a new one"""
+    root, exchange, _ = first
+    before = files(root)
+    last = {ticker: last_timestamp(root, ticker) for ticker in TICKERS}
+    exchange.since.clear()
+    exchange.rateLimit = 20
+    exchange.now = REFRESH_NOW
+    asyncio.run(OHLCVDownloader(exchange, root, retry_delay=0.01).download(TICKERS + ["NEW/USDT"], NEW_SINCE))
+    return root, exchange, before, last
+
+
+@pytest.mark.parametrize("ticker", TICKERS)
+def test_first_download_stores_every_closed_candle(first, ticker):
+    root, _, _ = first
+    assert stored_times(root, ticker) == expected_times(ticker, START, NOW)
+
+
+def test_open_candle_is_not_stored(first):
+    root, _, _ = first
+    assert last_timestamp(root, "SOL/USDT") == NOW - NOW % MINUTE_MS - MINUTE_MS
+
+
+def test_rate_limit_and_network_errors_are_retried(first):
+    _, exchange, downloader = first
+    assert exchange.rejected > 0
+    assert downloader.retries > exchange.rejected
+
+
+def test_gap_is_skipped(first):
+    root, _, _ = first
+    btc = set(stored_times(root, "BTC/USDT"))
+    assert not any(GAP[0] <= t <= GAP[1] for t in btc)
+    assert GAP[0] - MINUTE_MS in btc and GAP[1] + MINUTE_MS in btc
+
+
+def test_partitioned_by_ticker_and_month(first):
+    root, _, _ = first
+    months = sorted(os.listdir(os.path.join(root, f"symbol={partition_symbol('SOL/USDT')}")))
+    assert months == ["month=2025-02", "month=2025-03"]
+
+
+@pytest.mark.parametrize("ticker", TICKERS)
+def test_refresh_resumes_after_newest_stored_candle(refresh, ticker):
+    root, exchange, _, last = refresh
+    assert exchange.since[ticker][0] == last[ticker] + MINUTE_MS
+    assert stored_times(root, ticker) == expected_times(ticker, START, REFRESH_NOW)
+
+
+def test_refresh_appends_new_files_only(refresh):
+    root, _, before, last = refresh
+    after = files(root)
+    assert all(after.get(path) == stat for path, stat in before.items())
+    new = [path for path in after if path not in before]
+    assert new
+    for ticker in TICKERS:
+        for path in new:
+            if f"symbol={partition_symbol(ticker)}" in path:
+                assert int(os.path.basename(path).split("-")[0]) > last[ticker]
+    assert all("month=2025-03" in path for path in new)
+
+
+def test_new_ticker_starts_at_since(refresh):
+    root, _, _, _ = refresh
+    assert stored_times(root, "NEW/USDT") == expected_times("NEW/USDT", NEW_SINCE, REFRESH_NOW)
+
+
+def test_up_to_date_refresh_makes_no_requests(refresh):
+    root, exchange, _, _ = refresh
+    downloader = OHLCVDownloader(exchange, root, retry_delay=0.01)
+    counts = asyncio.run(downloader.download(TICKERS, START))
+    assert downloader.requests == 0
+    assert not any(counts.values())
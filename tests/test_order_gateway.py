@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import requests
+
+from order_gateway import OrderGateway
+
+RATE = 10
+
+
+class FakeClient:
+    """pybit HTTP stand-in: only the requests session the gateway mounts its adapter on"""
+
+    def __init__(self):
+        self.client = requests.Session()
+
+
+class TwoRequestOrders:
+    """FuturesOrders stand-in whose method makes two REST requests, like close_position"""
+
+    def __init__(self, cl):
+        self.cl = cl
+
+    def close_position(self):
+        self.cl.client.get("https://api.example.invalid/v5/position/list")
+        self.cl.client.post("https://api.example.invalid/v5/order/create")
+
+
+def test_every_rest_request_takes_a_token(monkeypatch):
+    sent = []
+
+    def send(adapter, request, **kwargs):
+        sent.append(time.monotonic())
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", send)
+    client = FakeClient()
+    orders = {symbol: TwoRequestOrders(client) for symbol in ("btcusdt", "ethusdt")}
+
+    async def run():
+        gateway = OrderGateway(orders, max_workers=4, rate=RATE)
+        await asyncio.gather(*(gateway.call(symbol, "close_position") for _ in range(5) for symbol in orders))
+        await gateway.close()
+
+    started = time.monotonic()
+    asyncio.run(run())
+    # 20 requests: a burst of RATE, the rest at RATE per second
+    assert len(sent) == 20
+    assert time.monotonic() - started >= (20 - RATE) / RATE * 0.9
+    for i in range(len(sent)):
+        for j in range(i + RATE, len(sent)):
+            assert j - i + 1 <= RATE + RATE * (sent[j] - sent[i]) + 1
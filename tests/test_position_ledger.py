@@ -0,0 +1,51 @@
+from position_ledger import PositionLedger
+
+
+def row(symbol, size, updated, side="Buy", price=10.0):
+    return dict(symbol=symbol, side=side, size=str(size), avgPrice=str(price), updatedTime=str(updated))
+
+
+class SnapshotClient:
+    """get_positions returns `rows`; `during` runs while the request is in flight"""
+
+    def __init__(self, rows, during=None):
+        self.rows = rows
+        self.during = during
+
+    def get_positions(self, **kwargs):
+        if self.during:
+            self.during()
+        return {"result": {"list": self.rows}}
+
+
+def test_stream_update_during_the_snapshot_is_kept():
+    client = SnapshotClient([row("BTCUSDT", 3, 1000)])
+    ledger = PositionLedger(client)
+    ledger.apply_position(row("BTCUSDT", 3, 1000))
+    client.during = lambda: ledger.on_position_message({"data": [row("BTCUSDT", 5, 2000)]})
+    ledger.reconcile()
+    assert ledger.get("BTCUSDT")["size"] == 5
+
+
+def test_position_opened_by_the_stream_during_the_snapshot_is_kept():
+    client = SnapshotClient([])
+    ledger = PositionLedger(client)
+    client.during = lambda: ledger.on_position_message({"data": [row("ETHUSDT", 2, 2000)]})
+    ledger.reconcile()
+    assert ledger.get("ETHUSDT")["size"] == 2 and ledger.n_positions == 1
+
+
+def test_snapshot_row_older_than_the_local_state_is_dropped():
+    ledger = PositionLedger(SnapshotClient([row("BTCUSDT", 3, 1000)]))
+    ledger.apply_position(row("BTCUSDT", 5, 2000))
+    ledger.reconcile()
+    assert ledger.get("BTCUSDT")["size"] == 5
+
+
+def test_newer_snapshot_overrides_and_closes_positions():
+    ledger = PositionLedger(SnapshotClient([row("BTCUSDT", 7, 3000)]))
+    ledger.apply_position(row("BTCUSDT", 5, 2000))
+    ledger.apply_position(row("SOLUSDT", 1, 2000))
+    ledger.reconcile()
+    assert ledger.get("BTCUSDT")["size"] == 7
+    assert ledger.get("SOLUSDT") is None and ledger.n_positions == 1
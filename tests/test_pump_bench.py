@@ -0,0 +1,9 @@
+from pump_bench import check_scenarios
+
+
+def test_scenarios_match_expected_states():
+    assert check_scenarios() == []
+
+
+def test_no_scenarios_is_a_failure(tmp_path):
+    assert check_scenarios(str(tmp_path)) != []
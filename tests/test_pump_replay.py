@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from pump_monitor import PumpMonitor, STATE_CODES
+from pump_replay import TRANSITION_DTYPE, expand_states, replay_symbol
+
+START_TIME = 1_740_000_000_000
+
+
+def random_series(seed, n=600):
+    """Random walk with injected pumps (a strong candle, a green run, a retrace) and dumps"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.003, n)
+    for start in rng.integers(0, n, rng.integers(1, 12)):
+        moves = np.concatenate([
+            [rng.uniform(0.005, 0.05)], rng.uniform(-0.004, 0.015, rng.integers(1, 8)),
+            -rng.uniform(0.0, 0.02, rng.integers(1, 20)), rng.uniform(0.0, 0.02, rng.integers(0, 5)),
+        ])
+        end = min(n, start + len(moves))
+        returns[start:end] = moves[:end - start]
+    close = 100.0 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    close_time = START_TIME + 60_000 * np.arange(1, n + 1) - 1
+    return open_, close, close_time
+
+
+def random_params(seed):
+    rng = np.random.default_rng(seed + 10_000)
+    return dict(
+        pump_started_condition=float(rng.choice([0.004, 0.01, 0.02])),
+        green_count_condition=int(rng.integers(1, 4)),
+        pump_cooling_off_condition=float(rng.uniform(0.1, 0.5)),
+        pump_stabilized_condition=float(rng.uniform(0.2, 0.8)),
+        pump_dumped_condition=float(rng.uniform(0.5, 1.5)),
+        base_remaining=int(rng.integers(1, 30)),
+        start_remaining=int(rng.integers(1, 10)),
+    )
+
+
+def monitor_run(o, c, close_time, params):
+    """States after every candle and the (index, close time) of every pump start of PumpMonitor"""
+    monitor = PumpMonitor("testusdt", **params)
+    states, starts = [], []
+    pump_id = None
+    for i, (open_price, close_price, t) in enumerate(zip(o.tolist(), c.tolist(), close_time.tolist())):
+        monitor.process_kline({"s": "testusdt", "o": open_price, "c": close_price, "T": t})
+        states.append(STATE_CODES[monitor.state])
+        if getattr(monitor, "pump_id", None) != pump_id:
+            pump_id = monitor.pump_id
+            starts.append((i, t))
+    return np.array(states, dtype=np.int8), starts
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_replay_matches_monitor(seed):
+    o, c, close_time = random_series(seed)
+    params = random_params(seed)
+    states, starts = monitor_run(o, c, close_time, params)
+    transitions, segments = replay_symbol(o, c, close_time, **params)
+
+    changed = np.flatnonzero(states != np.concatenate([[STATE_CODES["BASE"]], states[:-1]]))
+    expected = np.array(
+        [(i, states[i - 1] if i else STATE_CODES["BASE"], states[i]) for i in changed.tolist()],
+        dtype=TRANSITION_DTYPE,
+    )
+    np.testing.assert_array_equal(transitions, expected)
+    np.testing.assert_array_equal(expand_states(transitions, len(o)), states)
+    assert [(int(s["start"]), int(s["start_time"])) for s in segments] == starts
+    np.testing.assert_array_equal(segments["start_price"], o[[i for i, _ in starts]])
+
+
+def test_series_exercise_every_state():
+    seen = set()
+    for seed in range(200):
+        o, c, close_time = random_series(seed)
+        seen.update(expand_states(replay_symbol(o, c, close_time, **random_params(seed))[0], len(o)).tolist())
+    assert seen == set(STATE_CODES.values())
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from candle_store import CandleStore
+from kline_merge import frame_source
+from pump_sweep import load_candles
+
+OPEN_TIMES = 1_740_000_000_000 + 60_000 * np.arange(5)
+
+
+def frame():
+    return pd.DataFrame({
+        "ticker": "SOL/USDT", "datetime": pd.to_datetime(OPEN_TIMES, unit="ms"),
+        "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 10.0,
+    })
+
+
+def test_store_close_times_match_the_store_klines(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.add_frame(frame())
+    _, _, close_time = load_candles(str(tmp_path))["solusdt"]
+    assert close_time.tolist() == [kline["T"] for kline in store.klines("SOL/USDT")]
+
+
+def test_parquet_close_times_match_the_replayed_klines(tmp_path):
+    path = str(tmp_path / "candles.parquet")
+    frame().to_parquet(path)
+    _, _, close_time = load_candles(path)["solusdt"]
+    assert close_time.tolist() == [kline["T"] for kline in frame_source(frame())]